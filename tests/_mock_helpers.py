@@ -0,0 +1,19 @@
+from unittest.mock import MagicMock
+
+def mk_resp(status=200, json_body=None, content_chunks=None, headers=None, text=""):
+    """
+    Builds a pre-wired requests-like response mock.
+    When content_chunks is given, the mock also works as a streaming
+    context manager (`with requests.get(..., stream=True) as r`).
+    """
+    resp = MagicMock()
+    resp.status_code = status
+    resp.text = text
+    resp.headers = headers or {}
+    if json_body is not None:
+        resp.json.return_value = json_body
+    if content_chunks is not None:
+        resp.__enter__.return_value = resp
+        resp.__exit__.return_value = None
+        resp.iter_content.return_value = content_chunks
+    return resp
@@ -0,0 +1,10 @@
+import struct
+
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+
+def png_size(path):
+    """Asserts the file is a PNG and returns (width, height) from its IHDR chunk."""
+    with open(path, "rb") as f:
+        data = f.read(24)
+    assert data[:8] == PNG_MAGIC
+    return struct.unpack(">II", data[16:24])
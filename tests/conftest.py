@@ -0,0 +1,84 @@
+import sqlite3
+from unittest.mock import patch
+import pytest
+from sqlalchemy import create_engine, create_mock_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from youtube_factory.models import Base, JSON_ENGINE_KWARGS
+
+# Schema DDL compiled once at import; executed straight on the raw sqlite3
+# connection, so create_all's per-table existence checks are skipped.
+# A mock engine runs create_all without a database, so dialect-conditional
+# DDL (the Postgres-only GIN index) is filtered exactly as in production.
+def _compile_schema():
+    statements = []
+    mock = create_mock_engine("sqlite://", lambda sql, *a, **kw: statements.append(str(sql.compile(dialect=mock.dialect))))
+    Base.metadata.create_all(mock, checkfirst=False)
+    return ";\n".join(statements) + ";"
+
+SCHEMA_SQL = _compile_schema()
+
+def _create_memory_db():
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.executescript(SCHEMA_SQL)
+    return conn
+
+# One in-memory SQLite database for the whole test session.
+# StaticPool keeps a single connection alive so every session (and the
+# TestClient thread) sees the same database.
+@pytest.fixture(scope="session")
+def db_engine():
+    engine = create_engine(
+        "sqlite://",
+        creator=_create_memory_db,
+        poolclass=StaticPool,
+        **JSON_ENGINE_KWARGS
+    )
+
+    # pysqlite's own transaction handling breaks SAVEPOINT; let SQLAlchemy
+    # emit BEGIN itself (see the SQLAlchemy SQLite dialect docs).
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    # Tests never need durability; skip the sync/journal work on commit
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_connection, connection_record):
+        cur = dbapi_connection.cursor()
+        cur.execute("PRAGMA synchronous=OFF")
+        cur.execute("PRAGMA journal_mode=MEMORY")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.close()
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    yield engine
+    engine.dispose()
+
+# Each test runs inside an outer transaction that is rolled back on teardown.
+# Code under test may call commit(); with "create_savepoint" those commits only
+# release a SAVEPOINT, so nothing leaks between tests.
+@pytest.fixture
+def db_session(db_engine):
+    connection = db_engine.connect()
+    trans = connection.begin()
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+    yield session
+    session.close()
+    trans.rollback()
+    connection.close()
+
+# The worker builds an OpenAI client per pipeline run; no test should ever
+# get a real one, so patch it once for the session rather than per test.
+@pytest.fixture(scope="session")
+def stub_openai():
+    with patch("youtube_factory.worker.openai") as mock_openai:
+        yield mock_openai
+
+# Async tests (@pytest.mark.anyio) run on asyncio only
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
@@ -1,57 +1,82 @@
 import pytest
 from fastapi.testclient import TestClient
+try:
+    import httpx2 as httpx # what newer Starlette TestClient builds on
+except ImportError:
+    import httpx
 from unittest.mock import MagicMock, patch
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
+from youtube_factory import worker
+from youtube_factory.api import app as app_module
 from youtube_factory.api.app import app, get_db
-from youtube_factory.models import Base, Job
-
-from sqlalchemy.pool import StaticPool
-
-# Use in-memory SQLite for tests
-@pytest.fixture(scope="module")
-def db_engine():
-    engine = create_engine(
-        "sqlite:///:memory:",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool
-    )
-    Base.metadata.create_all(engine)
-    return engine
-
-@pytest.fixture(scope="module")
-def db_session_factory(db_engine):
-    return sessionmaker(bind=db_engine)
-
-@pytest.fixture
-def db_session(db_session_factory):
-    session = db_session_factory()
-    yield session
-    session.close()
-
-@pytest.fixture
-def client(db_session):
+from youtube_factory.models import Job
+
+# One TestClient (and one app startup) for the whole run; only the DB
+# dependency is swapped per test.
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+# Async client over the ASGI app, reused across tests for multi-request tests
+@pytest.fixture(scope="session")
+async def async_client(anyio_backend):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+@pytest.fixture(autouse=True)
+def _override_db(db_session):
     def override_get_db():
-        try:
-            yield db_session
-        finally:
-            pass # Don't close here, fixture closes it
-            
+        yield db_session # Don't close here, fixture closes it
+
     app.dependency_overrides[get_db] = override_get_db
-    return TestClient(app)
+    yield
+    app.dependency_overrides.pop(get_db, None)
 
-@pytest.fixture
+# No API test should reach Redis; patch the queue once for the module
+@pytest.fixture(scope="module", autouse=True)
 def mock_queue():
     with patch("youtube_factory.api.app.queue") as mock_q:
         yield mock_q
 
+class _FakeRedis:
+    """Just the hash commands progress publishing/reading use, pipelined."""
+    def __init__(self):
+        self.hashes = {}
+        self._ops = []
+
+    def pipeline(self, transaction=True):
+        self._ops = []
+        return self
+
+    def hset(self, key, mapping):
+        self._ops.append(lambda: self.hashes.setdefault(key, {}).update(
+            {k.encode(): v.encode() for k, v in mapping.items()}))
+
+    def expire(self, key, seconds):
+        self._ops.append(lambda: True)
+
+    def hgetall(self, key):
+        self._ops.append(lambda: dict(self.hashes.get(key, {})))
+
+    def execute(self):
+        ops, self._ops = self._ops, []
+        return [op() for op in ops]
+
+# Progress goes through the worker's Redis connection; keep it in memory
+@pytest.fixture(autouse=True)
+def fake_redis():
+    fake = _FakeRedis()
+    with patch.object(worker, "redis_conn", fake):
+        yield fake
+
 def test_health_check(client):
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
 
-def test_enqueue_job(client, mock_queue):
+def test_enqueue_job(client, mock_queue, db_session):
     payload = {
         "topic": "API Test",
         "niche": "Tech",
@@ -64,25 +89,74 @@ def test_enqueue_job(client, mock_queue):
     data = response.json()
     assert data["status"] == "queued"
     assert "job_id" in data
+    job = db_session.get(Job, data["job_id"])
+    assert (job.status, job.topic_hint) == ("queued", "API Test")
+    assert job.created_at is not None
     
     mock_queue.enqueue.assert_called_once()
+    assert mock_queue.enqueue.call_args.kwargs["job_id"] == data["job_id"]
 
-def test_list_jobs(client, db_session):
-    # Create dummy job
-    job = Job(niche="Test", topic_hint="List Test", status="completed")
-    db_session.add(job)
+def test_enqueue_jobs_batch(client, mock_queue, db_session):
+    payload = [{"topic": f"Batch {i}", "niche": "Tech"} for i in range(3)]
+    response = client.post("/enqueue/batch", json=payload)
+    assert response.status_code == 200
+    job_ids = response.json()["job_ids"]
+    assert len(job_ids) == 3
+
+    # All three go to Redis in a single enqueue_many call
+    mock_queue.enqueue_many.assert_called_once()
+    (job_datas,), _ = mock_queue.enqueue_many.call_args
+    assert [d.kwargs["job_id"] for d in job_datas] == job_ids
+    assert [d.kwargs["topic"] for d in job_datas] == ["Batch 0", "Batch 1", "Batch 2"]
+    assert all(db_session.get(Job, i).status == "queued" for i in job_ids)
+
+def test_enqueue_jobs_batch_single_insert_returns_row_ids(client, mock_queue, db_session):
+    from sqlalchemy import event
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement.split(None, 1)[0].upper())
+    event.listen(db_session.bind, "before_cursor_execute", record)
+    try:
+        payload = [{"topic": f"Returning {i}", "niche": f"N{i}"} for i in range(5)]
+        response = client.post("/enqueue/batch", json=payload)
+    finally:
+        event.remove(db_session.bind, "before_cursor_execute", record)
+    assert response.status_code == 200
+
+    # Ids come back from the INSERT itself, in request order
+    job_ids = response.json()["job_ids"]
+    assert [(db_session.get(Job, i).topic_hint, db_session.get(Job, i).niche) for i in job_ids] == \
+        [(f"Returning {i}", f"N{i}") for i in range(5)]
+    assert statements.count("INSERT") == 1
+    assert "SELECT" not in statements
+
+def test_enqueue_jobs_batch_empty(client, mock_queue):
+    mock_queue.enqueue_many.reset_mock()
+    response = client.post("/enqueue/batch", json=[])
+    assert response.json() == {"status": "queued", "job_ids": []}
+    mock_queue.enqueue_many.assert_not_called()
+
+@pytest.mark.anyio
+async def test_list_jobs(async_client, db_session):
+    # Create dummy jobs
+    jobs = [Job(niche="Test", topic_hint=f"List Test {i}", status="completed") for i in range(3)]
+    db_session.add_all(jobs)
     db_session.commit()
     
-    response = client.get("/jobs")
+    response = await async_client.get("/jobs")
     assert response.status_code == 200
     data = response.json()
-    assert len(data) >= 1
-    # Check if our job is in list
-    found = any(j["id"] == job.id for j in data)
-    assert found
+    assert sorted(j["id"] for j in data) == sorted(j.id for j in jobs)
+    
+    # Pagination
+    first = await async_client.get("/jobs", params={"limit": 2})
+    rest = await async_client.get("/jobs", params={"skip": 2, "limit": 2})
+    assert len(first.json()) == 2
+    assert len(rest.json()) == 1
+    assert {j["id"] for j in first.json() + rest.json()} == {j.id for j in jobs}
 
 def test_get_job_details(client, db_session):
-    job = Job(niche="Test", topic_hint="Detail Test", status="processing")
+    job = Job(niche="Test", topic_hint="Detail Test", status="processing", metadata_json={"script": {"title": "T"}})
     db_session.add(job)
     db_session.commit()
     
@@ -91,19 +165,51 @@ def test_get_job_details(client, db_session):
     data = response.json()
     assert data["id"] == job.id
     assert data["topic_hint"] == "Detail Test"
+    assert data["metadata_json"] == {"script": {"title": "T"}}
+    assert set(data) == {"id", "status", "niche", "topic_hint", "created_at", "updated_at", "metadata_json", "progress"}
+    assert data["progress"] is None
+
+def test_job_progress_round_trip(client, db_session):
+    job = Job(niche="Test", topic_hint="Progress Test", status="processing")
+    db_session.add(job)
+    db_session.commit()
+
+    worker._publish_progress(job.id, "tts_complete")
+
+    progress = client.get(f"/jobs/{job.id}").json()["progress"]
+    assert progress["stage"] == "tts_complete"
+    assert "updated_at" in progress
+    assert "<td>tts_complete</td>" in client.get("/").text
+
+def test_job_details_survive_redis_outage(client, db_session, fake_redis):
+    job = Job(niche="Test", topic_hint="No Redis", status="processing")
+    db_session.add(job)
+    db_session.commit()
+
+    with patch.object(fake_redis, "execute", side_effect=ConnectionError("down")):
+        response = client.get(f"/jobs/{job.id}")
+    assert response.status_code == 200
+    assert response.json()["progress"] is None
+
+def test_dashboard_escapes_fields(client, db_session):
+    job = Job(niche="Tech", topic_hint="<script>alert(1)</script>", status="queued")
+    db_session.add(job)
+    db_session.commit()
+    
+    response = client.get("/")
+    assert response.status_code == 200
+    assert f'<a href="/jobs/{job.id}">' in response.text
+    assert "&lt;script&gt;alert(1)&lt;/script&gt;" in response.text
+    assert "<script>" not in response.text
+
+def test_auth_enforcement(client, monkeypatch):
+    # MONITOR_API_KEY is read at import time, so patch the module-level value
+    monkeypatch.setattr(app_module, "MONITOR_API_KEY", "secret")
 
-def test_auth_enforcement(client):
-    # Patch environ to simulate set API key
-    with patch.dict("os.environ", {"MONITOR_API_KEY": "secret"}):
-        # We need to reload/re-instantiate app or logic to pick up env var if it's read at import time.
-        # In `youtube_factory/api/app.py`, `MONITOR_API_KEY = os.environ.get(...)` runs at import.
-        # So mocking os.environ here won't affect the already imported `MONITOR_API_KEY` global.
-        # We need to patch the module-level variable.
-        with patch("youtube_factory.api.app.MONITOR_API_KEY", "secret"):
-            # Request without header
-            response = client.get("/jobs")
-            assert response.status_code == 403
-            
-            # Request with header
-            response = client.get("/jobs", headers={"X-API-KEY": "secret"})
-            assert response.status_code == 200
+    # Request without header
+    response = client.get("/jobs")
+    assert response.status_code == 403
+
+    # Request with header
+    response = client.get("/jobs", headers={"X-API-KEY": "secret"})
+    assert response.status_code == 200
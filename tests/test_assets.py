@@ -1,11 +1,14 @@
 import json
 import os
+import threading
+import time
 from pathlib import Path
-from unittest.mock import MagicMock, patch
 import pytest
-from PIL import Image
+import requests_mock
 
+from youtube_factory.tasks import assets as assets_module
 from youtube_factory.tasks.assets import build_assets
+from _png import png_size
 
 @pytest.fixture
 def sample_script():
@@ -30,87 +33,41 @@ def test_build_assets_fallback_slides(sample_script, mock_storage):
         assert path.exists()
         assert path.suffix == ".png"
         assert path.name.endswith("_slide.png")
-        # Verify it's a valid image
-        with Image.open(path) as img:
-            assert img.format == "PNG"
-
-@patch("youtube_factory.tasks.assets.requests.get")
-def test_build_assets_pexels_success(mock_get, sample_script, mock_storage):
-    # Mock search response
-    mock_search_resp = MagicMock()
-    mock_search_resp.status_code = 200
-    mock_search_resp.json.return_value = {
-        "videos": [
-            {
-                "video_files": [
-                    {"quality": "hd", "file_type": "video/mp4", "link": "http://fake.url/video.mp4"}
-                ]
-            }
-        ]
-    }
-    
-    # Mock download response
-    mock_download_resp = MagicMock()
-    mock_download_resp.status_code = 200
-    # Ensure context manager returns self
-    mock_download_resp.__enter__.return_value = mock_download_resp
-    mock_download_resp.__exit__.return_value = None
-    # iter_content should return an iterable (list is fine)
-    mock_download_resp.iter_content.return_value = [b"fake_video_data"]
-    
-    # Configure side_effect to return search response then download response(s)
-    # We have 2 sections, so 2 searches and 2 downloads expected = 4 calls
-    mock_get.side_effect = [
-        mock_search_resp, mock_download_resp,
-        mock_search_resp, mock_download_resp
+        # Verify it's a PNG slide
+        assert png_size(path) == (1280, 720)
+
+PEXELS_SEARCH_URL = "https://api.pexels.com/videos/search"
+VIDEO_URL = "http://fake.url/video.mp4"
+PEXELS_HIT = {
+    "videos": [
+        {
+            "video_files": [
+                {"quality": "hd", "file_type": "video/mp4", "link": VIDEO_URL}
+            ]
+        }
     ]
-    
-    assets = build_assets(sample_script, mock_storage, pexels_api_key="fake_key")
+}
+
+def test_build_assets_pexels_success(sample_script, mock_storage):
+    with requests_mock.Mocker() as m:
+        m.get(PEXELS_SEARCH_URL, json=PEXELS_HIT)
+        m.get(VIDEO_URL, content=b"fake_video_data")
+        
+        assets = build_assets(sample_script, mock_storage, pexels_api_key="fake_key")
     
     assert len(assets) == 2
     for path in assets:
-        assert path.exists()
         assert path.suffix == ".mp4"
-        with open(path, "rb") as f:
-            content = f.read()
-            assert content == b"fake_video_data"
-
-@patch("youtube_factory.tasks.assets.requests.get")
-def test_build_assets_pexels_mixed_failure(mock_get, sample_script, mock_storage):
-    # First section: Pexels fails (returns no videos)
-    mock_empty_search = MagicMock()
-    mock_empty_search.status_code = 200
-    mock_empty_search.json.return_value = {"videos": []}
-    
-    # Second section: Pexels succeeds
-    mock_success_search = MagicMock()
-    mock_success_search.status_code = 200
-    mock_success_search.json.return_value = {
-        "videos": [
-            {
-                "video_files": [
-                    {"quality": "hd", "file_type": "video/mp4", "link": "http://fake.url/video.mp4"}
-                ]
-            }
-        ]
-    }
-    
-    mock_download_resp = MagicMock()
-    mock_download_resp.status_code = 200
-    mock_download_resp.__enter__.return_value = mock_download_resp
-    mock_download_resp.__exit__.return_value = None
-    mock_download_resp.iter_content.return_value = [b"fake_video_data"]
-    
-    # Sequence: 
-    # 1. Search for section 1 -> Empty
-    # 2. Search for section 2 -> Found
-    # 3. Download for section 2 -> Content
-    mock_get.side_effect = [
-        mock_empty_search, 
-        mock_success_search, mock_download_resp
-    ]
-    
-    assets = build_assets(sample_script, mock_storage, pexels_api_key="fake_key")
+        assert path.read_bytes() == b"fake_video_data"
+
+def test_build_assets_pexels_mixed_failure(sample_script, mock_storage):
+    with requests_mock.Mocker() as m:
+        # First section's b_roll query finds nothing, second section's finds a clip
+        m.get(PEXELS_SEARCH_URL + "?query=welcome+wave", json={"videos": []})
+        m.get(PEXELS_SEARCH_URL + "?query=nature+landscape", json=PEXELS_HIT)
+        m.get(VIDEO_URL, content=b"fake_video_data")
+        
+        assets = build_assets(sample_script, mock_storage, pexels_api_key="fake_key")
     
     assert len(assets) == 2
     
@@ -121,3 +78,83 @@ def test_build_assets_pexels_mixed_failure(mock_get, sample_script, mock_storage
     # Second asset should be a video
     assert assets[1].suffix == ".mp4"
     assert "02_clip" in assets[1].name
+    assert assets[1].read_bytes() == b"fake_video_data"
+    # Only the clip that was found lands in the cache, with no leftover partials
+    assert [p.name for p in (mock_storage / "asset_cache").iterdir()] == [
+        assets_module._cached_clip_path(Path(), "nature landscape").name
+    ]
+
+def test_build_assets_reuses_cached_clips(sample_script, mock_storage):
+    with requests_mock.Mocker() as m:
+        m.get(PEXELS_SEARCH_URL, json=PEXELS_HIT)
+        m.get(VIDEO_URL, content=b"fake_video_data")
+        build_assets(sample_script, mock_storage, pexels_api_key="fake_key")
+    
+    # Second job with the same b-roll queries: no Pexels traffic at all
+    with requests_mock.Mocker() as m:
+        assets = build_assets(sample_script, mock_storage, pexels_api_key="fake_key")
+        assert m.call_count == 0
+    
+    assert [p.read_bytes() for p in assets] == [b"fake_video_data"] * 2
+
+def test_build_assets_different_query_misses_cache(sample_script, mock_storage):
+    with requests_mock.Mocker() as m:
+        m.get(PEXELS_SEARCH_URL, json=PEXELS_HIT)
+        m.get(VIDEO_URL, content=b"fake_video_data")
+        build_assets(sample_script, mock_storage, pexels_api_key="fake_key")
+
+        sample_script["sections"][1]["b_roll"] = "city skyline"
+        m.reset_mock()
+        build_assets(sample_script, mock_storage, pexels_api_key="fake_key")
+        searched = [r.qs["query"] for r in m.request_history if r.url.startswith(PEXELS_SEARCH_URL)]
+
+    # Only the new query goes to Pexels; the unchanged one is still a hit
+    assert searched == [["city skyline"]]
+
+def test_expired_cached_clip_is_refetched(sample_script, mock_storage, monkeypatch):
+    with requests_mock.Mocker() as m:
+        m.get(PEXELS_SEARCH_URL, json=PEXELS_HIT)
+        m.get(VIDEO_URL, content=b"fake_video_data")
+        build_assets(sample_script, mock_storage, pexels_api_key="fake_key")
+
+        stale = assets_module._cached_clip_path(mock_storage / "asset_cache", "welcome wave")
+        old = stale.stat().st_mtime - assets_module.ASSET_CACHE_MAX_AGE - 60
+        os.utime(stale, (old, old))
+        m.reset_mock()
+        build_assets(sample_script, mock_storage, pexels_api_key="fake_key")
+        searched = [r.qs["query"] for r in m.request_history if r.url.startswith(PEXELS_SEARCH_URL)]
+
+    assert searched == [["welcome wave"]]
+    assert stale.stat().st_mtime > old
+
+def test_prune_clip_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(assets_module, "ASSET_CACHE_MAX_BYTES", 10)
+    now = time.time()
+    clips = {}
+    for age, name in [(300, "oldest"), (200, "older"), (100, "recent"), (0, "new")]:
+        clips[name] = tmp_path / f"{name}.mp4"
+        clips[name].write_bytes(b"x" * 4)
+        os.utime(clips[name], (now - age, now - age))
+    expired = tmp_path / "expired.mp4"
+    expired.write_bytes(b"x")
+    os.utime(expired, (now - assets_module.ASSET_CACHE_MAX_AGE - 1,) * 2)
+    abandoned = tmp_path / "abc.mp4.123.part"
+    abandoned.write_bytes(b"x")
+    os.utime(abandoned, (now - assets_module.ASSET_CACHE_MAX_AGE - 1,) * 2)
+
+    assets_module._prune_clip_cache(tmp_path, keep=clips["new"])
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["new.mp4", "recent.mp4"]
+
+def test_build_assets_fetches_sections_concurrently(sample_script, mock_storage, monkeypatch):
+    # Both searches must be in flight at once for the barrier to release
+    barrier = threading.Barrier(len(sample_script["sections"]), timeout=5)
+
+    def fake_search(query, api_key):
+        barrier.wait()
+        return None
+
+    monkeypatch.setattr(assets_module, "_search_pexels_video", fake_search)
+    assets = build_assets(sample_script, mock_storage, pexels_api_key="fake_key")
+
+    assert [p.name for p in assets] == ["01_slide.png", "02_slide.png"]
@@ -1,38 +1,48 @@
 import os
+import re
+import wave
 import pytest
 from pathlib import Path
-from unittest.mock import MagicMock
-from moviepy import AudioFileClip, AudioClip
-from PIL import Image
-import numpy as np
 
+from youtube_factory.tasks import composer
 from youtube_factory.tasks.composer import compose_video
 
+# Smallest valid 1x1 red RGB PNG; the composer rescales every asset anyway
+PNG_1x1 = (
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x02"
+    b"\x00\x00\x00\x90wS\xde\x00\x00\x00\x0cIDATx\xdac\xf8\xcf\xc0\x00\x00\x03\x01"
+    b"\x01\x00\xf7\x03AC\x00\x00\x00\x00IEND\xaeB`\x82"
+)
+
+# Lowest practical rate for the dummy voice; it only has to carry a duration
+VOICE_RATE = 8000
+VOICE_SECONDS = 2.0
+
 @pytest.fixture
 def mock_storage(tmp_path):
     return tmp_path
 
-@pytest.fixture
-def dummy_assets(mock_storage):
+# Assets and voice are read-only inputs to the composer; build them once per module
+@pytest.fixture(scope="module")
+def dummy_assets(tmp_path_factory):
     # Create 2 image assets
+    asset_dir = tmp_path_factory.mktemp("assets")
     assets = []
     for i in range(2):
-        p = mock_storage / f"asset_{i}.png"
-        img = Image.new("RGB", (100, 100), color=(255, 0, 0))
-        img.save(p)
+        p = asset_dir / f"asset_{i}.png"
+        p.write_bytes(PNG_1x1)
         assets.append(p)
     return assets
 
-@pytest.fixture
-def dummy_voice(mock_storage):
-    # Create a short silent audio file using moviepy
-    # AudioClip takes a make_frame(t) -> numpy array
-    def make_frame(t):
-        return np.array([0, 0]) # Stereo silence
-        
-    clip = AudioClip(make_frame, duration=2.0, fps=44100)
-    p = mock_storage / "voice.mp3"
-    clip.write_audiofile(str(p), logger=None)
+@pytest.fixture(scope="module")
+def dummy_voice(tmp_path_factory):
+    # Mono 8 kHz silence written with the stdlib; no ffmpeg encode needed
+    p = tmp_path_factory.mktemp("voice") / "voice.wav"
+    with wave.open(str(p), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(VOICE_RATE)
+        w.writeframes(b"\x00\x00" * int(VOICE_RATE * VOICE_SECONDS))
     return p
 
 @pytest.fixture
@@ -45,6 +55,7 @@ def sample_script():
         ]
     }
 
+@pytest.mark.slow
 def test_compose_video_success(sample_script, dummy_voice, dummy_assets, mock_storage):
     output_dir = mock_storage / "output"
     output_dir.mkdir()
@@ -69,6 +80,45 @@ def test_compose_video_success(sample_script, dummy_voice, dummy_assets, mock_st
     assert "Another short text." in content
     assert "00:00:00,000" in content
 
+def test_compose_video_unit(sample_script, dummy_voice, dummy_assets, mock_storage, monkeypatch):
+    # No ffmpeg at all: stub the probe and the encode, and only check the
+    # composer's own bookkeeping (ffmpeg arguments, output path, SRT)
+    calls = []
+    def fake_run(args):
+        calls.append(args)
+        Path(args[-1]).write_bytes(b"MP4")
+    monkeypatch.setattr(composer, "run_ffmpeg", fake_run)
+    monkeypatch.setattr(composer, "probe_duration", lambda path: VOICE_SECONDS)
+    
+    output_dir = mock_storage / "output"
+    output_dir.mkdir()
+    
+    final_path = compose_video(
+        script_obj=sample_script,
+        voice_file=dummy_voice,
+        assets=dummy_assets,
+        output_path=output_dir,
+        fps=1
+    )
+    
+    # A single ffmpeg invocation does the whole edit
+    (args,) = calls
+    assert final_path.read_bytes() == b"MP4"
+    assert args[-1] == str(final_path)
+    assert args[args.index("-r") + 1] == "1"
+    assert args[args.index("-c:v") + 1] == "libx264"
+    # Per-asset segment lengths add up to the voiceover
+    graph = args[args.index("-filter_complex") + 1]
+    durations = [float(d) for d in re.findall(r"trim=duration=([\d.]+)", graph)]
+    assert len(durations) == len(dummy_assets)
+    assert sum(durations) == pytest.approx(VOICE_SECONDS, abs=1e-2)
+    assert "concat=n=2:v=1:a=0" in graph
+    assert graph.count("fade=t=in") == 1
+    
+    content = final_path.with_suffix(".srt").read_text()
+    assert "Short text." in content
+    assert "Another short text." in content
+
 def test_compose_video_missing_voice(sample_script, dummy_assets, mock_storage):
     with pytest.raises(FileNotFoundError):
         compose_video(
@@ -77,3 +127,16 @@ def test_compose_video_missing_voice(sample_script, dummy_assets, mock_storage):
             assets=dummy_assets,
             output_path=mock_storage
         )
+
+@pytest.mark.parametrize("seconds, expected", [
+    (0.0, "00:00:00,000"),
+    (61.5, "00:01:01,500"),
+    (3725.25, "01:02:05,250"),
+])
+def test_format_srt_time(seconds, expected):
+    assert composer._format_srt_time(seconds) == expected
+
+def test_video_encoder_falls_back_to_libx264(monkeypatch):
+    monkeypatch.setattr(composer, "available_encoders", lambda: frozenset({"libx264", "h264_nvenc"}))
+    assert composer._video_encoder_args("h264_nvenc")[:2] == ["-c:v", "h264_nvenc"]
+    assert composer._video_encoder_args("h264_videotoolbox")[:2] == ["-c:v", "libx264"]
@@ -0,0 +1,53 @@
+import pytest
+from unittest.mock import MagicMock
+
+from youtube_factory.utils import retry as retry_module
+from youtube_factory.utils.retry import RateLimiter, call_with_retry, retry_after_seconds
+from _mock_helpers import mk_resp
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # Record backoff sleeps instead of taking them
+    calls = []
+    monkeypatch.setattr(retry_module, "_sleep", calls.append)
+    return calls
+
+class HTTPError(Exception):
+    def __init__(self, headers):
+        super().__init__("http error")
+        self.response = mk_resp(status=429, headers=headers)
+
+def test_call_with_retry_honours_retry_after(sleeps):
+    fn = MagicMock(side_effect=[HTTPError({"Retry-After": "7"}), HTTPError({}), "ok"])
+    
+    assert call_with_retry(fn, attempts=3, base=1.0, cap=10.0) == "ok"
+    assert fn.call_count == 3
+    # Server-specified delay verbatim, then jittered exponential backoff (1 * 2**1 + U(0, 1))
+    assert sleeps[0] == 7.0
+    assert 2.0 <= sleeps[1] <= 3.0
+
+def test_call_with_retry_reraises_last_error(sleeps):
+    fn = MagicMock(side_effect=ValueError("boom"))
+    
+    with pytest.raises(ValueError, match="boom"):
+        call_with_retry(fn, attempts=3)
+    assert fn.call_count == 3
+    assert len(sleeps) == 2
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after-ms": "1500"}, 1.5),
+    ({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}, None),
+    ({}, None),
+], ids=["millis", "http_date", "absent"])
+def test_retry_after_seconds(headers, expected):
+    assert retry_after_seconds(HTTPError(headers)) == expected
+
+def test_rate_limiter_waits_for_budget(sleeps):
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600)
+    
+    # Full buckets: no wait
+    limiter.acquire(tokens=600)
+    assert sleeps == []
+    # Token bucket now empty: 300 tokens at 10/s is ~30s away
+    limiter.acquire(tokens=300)
+    assert sleeps[0] == pytest.approx(30.0, abs=0.1)
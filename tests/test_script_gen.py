@@ -1,7 +1,14 @@
 import pytest
 import json
-from unittest.mock import MagicMock
-from youtube_factory.tasks.script_gen import generate_script
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+import openai
+from aiohttp import web
+from youtube_factory.tasks import script_gen
+from youtube_factory.utils.retry import retry_after_seconds
+from youtube_factory.tasks.script_gen import (
+    AiohttpLLMClient, LLMHTTPError, generate_script, generate_scripts_async, generate_scripts_batch
+)
 
 # Mock object structure for OpenAI response
 class MockMessage:
@@ -56,25 +63,139 @@ def test_generate_script_content_not_allowed(mock_llm_client):
     
     assert "content_not_allowed" in str(excinfo.value)
 
-def test_generate_script_invalid_json(mock_llm_client):
-    # Prepare malformed JSON
-    mock_llm_client.chat.completions.create.return_value = MockResponse("{not valid json")
+@pytest.mark.parametrize("content", [
+    "{not valid json",                         # malformed JSON
+    json.dumps({"title": "Incomplete"}),        # missing sections, etc.
+    json.dumps({"title": "T", "hook": "H", "sections": "oops", "cta": "", "tags": [], "shorts": []}),
+], ids=["malformed_json", "missing_keys", "sections_not_list"])
+def test_generate_script_invalid_response(mock_llm_client, content):
+    mock_llm_client.chat.completions.create.return_value = MockResponse(content)
     
     with pytest.raises(ValueError) as excinfo:
         generate_script("coding", llm_client=mock_llm_client)
         
     assert "invalid_response" in str(excinfo.value)
 
-def test_generate_script_missing_keys(mock_llm_client):
-    # Prepare JSON missing keys
-    incomplete_response = {
-        "title": "Incomplete"
-        # missing sections, etc.
+@pytest.mark.anyio
+async def test_generate_scripts_async(mock_llm_client):
+    valid = {"title": "T", "hook": "H", "sections": [], "cta": "", "tags": [], "shorts": []}
+    replies = {
+        "good": MockResponse(json.dumps(valid)),
+        "bad": MockResponse("{not valid json"),
     }
+    in_flight = peak = 0
+
+    async def fake_create(model, messages, response_format):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0)
+        in_flight -= 1
+        topic = "good" if "topic: good" in messages[1]["content"] else "bad"
+        return replies[topic]
+
+    mock_llm_client.chat.completions.create = AsyncMock(side_effect=fake_create)
     
-    mock_llm_client.chat.completions.create.return_value = MockResponse(json.dumps(incomplete_response))
+    results = await generate_scripts_async(
+        ["good", "bad", "good", "good"], llm_client=mock_llm_client, concurrency=2
+    )
     
-    with pytest.raises(ValueError) as excinfo:
-        generate_script("coding", llm_client=mock_llm_client)
-        
-    assert "invalid_response" in str(excinfo.value)
+    # Order preserved, failures returned in place, never more than 2 in flight
+    assert results[0] == valid and results[2] == valid and results[3] == valid
+    assert isinstance(results[1], ValueError) and "invalid_response" in str(results[1])
+    assert peak == 2
+
+def test_generate_scripts_batch(mock_llm_client):
+    script = {"title": "T", "hook": "H", "sections": [], "cta": "", "tags": [], "shorts": []}
+    reply = {"scripts": [
+        # Out of order on purpose; entries are matched by index
+        dict(script, index=3, title="Third"),
+        dict(script, index=1, title="First"),
+        {"index": 2, "error": "content_not_allowed", "reason": "nope"},
+    ]}
+    mock_llm_client.chat.completions.create.side_effect = [
+        MockResponse(json.dumps(reply)),
+        MockResponse(json.dumps({"scripts": []})),
+    ]
+    
+    results = generate_scripts_batch(["a", "b", "c", "d"], llm_client=mock_llm_client, batch_size=3)
+    
+    # Two requests: topics a-c, then d (whose reply comes back empty)
+    assert mock_llm_client.chat.completions.create.call_count == 2
+    prompt = mock_llm_client.chat.completions.create.call_args_list[0].kwargs["messages"][1]["content"]
+    assert "1. a\n2. b\n3. c" in prompt
+    assert results[0]["title"] == "First" and "index" not in results[0]
+    assert "content_not_allowed" in str(results[1])
+    assert results[2]["title"] == "Third"
+    assert "invalid_response" in str(results[3])
+
+@pytest.mark.parametrize("wrap", [
+    lambda body: f"Here you go:\n```json\n{body}\n```",
+    lambda body: body.replace('"title"', "\u201ctitle\u201d"),
+], ids=["fenced", "curly_quotes"])
+def test_generate_script_salvages_near_json(mock_llm_client, wrap):
+    body = json.dumps({"title": "T", "hook": "H", "sections": [], "cta": "", "tags": [], "shorts": []})
+    mock_llm_client.chat.completions.create.return_value = MockResponse(wrap(body))
+    
+    assert generate_script("coding", llm_client=mock_llm_client)["title"] == "T"
+
+VALID_SCRIPT = {"title": "T", "hook": "H", "sections": [], "cta": "", "tags": [], "shorts": []}
+
+# Local chat-completions endpoint; records every request body and auth header
+@pytest.fixture
+async def completions_server(anyio_backend):
+    seen = []
+
+    async def handle(request):
+        seen.append((request.headers.get("Authorization"), await request.json()))
+        if request.headers.get("Authorization") == "Bearer throttled":
+            return web.json_response({"error": "slow down"}, status=429, headers={"Retry-After": "7"})
+        return web.json_response({"choices": [{"message": {"content": json.dumps(VALID_SCRIPT)}}]})
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    yield f"http://127.0.0.1:{port}/v1", seen
+    await runner.cleanup()
+
+@pytest.mark.anyio
+async def test_aiohttp_client_posts_chat_completion(completions_server):
+    base_url, seen = completions_server
+    async with AiohttpLLMClient("key", base_url) as client:
+        results = await generate_scripts_async(["a", "b"], llm_client=client)
+
+    assert results == [VALID_SCRIPT, VALID_SCRIPT]
+    assert [auth for auth, _ in seen] == ["Bearer key"] * 2
+    assert seen[0][1]["model"] == script_gen.SCRIPT_MODEL
+    assert seen[0][1]["response_format"] == {"type": "json_object"}
+
+@pytest.mark.anyio
+async def test_aiohttp_client_error_carries_retry_after(completions_server):
+    base_url, _ = completions_server
+    async with AiohttpLLMClient("throttled", base_url) as client:
+        with pytest.raises(LLMHTTPError) as excinfo:
+            await client.chat.completions.create(model="m", messages=[])
+
+    assert excinfo.value.status == 429
+    assert retry_after_seconds(excinfo.value) == 7
+
+@pytest.mark.anyio
+async def test_generate_scripts_async_uses_aiohttp_at_high_concurrency(completions_server, monkeypatch):
+    base_url, seen = completions_server
+    monkeypatch.setattr(script_gen, "AIOHTTP_MIN_CONCURRENCY", 4)
+    sdk_client = openai.AsyncOpenAI(api_key="key", base_url=base_url)
+
+    with patch.object(sdk_client.chat.completions, "create", new=AsyncMock()) as sdk_create:
+        # Below the threshold the SDK client is used as given
+        await generate_scripts_async(["a"], llm_client=sdk_client, concurrency=3)
+        assert sdk_create.await_count == 1 and not seen
+
+        results = await generate_scripts_async(["a", "b", "c"], llm_client=sdk_client, concurrency=4)
+
+    assert sdk_create.await_count == 1
+    assert results == [VALID_SCRIPT] * 3
+    assert [auth for auth, _ in seen] == ["Bearer key"] * 3
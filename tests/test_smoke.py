@@ -3,22 +3,7 @@ from unittest.mock import MagicMock, patch
 import os
 from pathlib import Path
 from youtube_factory.worker import run_pipeline
-from youtube_factory.models import Job, Base
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
-@pytest.fixture
-def db_engine():
-    engine = create_engine("sqlite:///:memory:")
-    Base.metadata.create_all(engine)
-    return engine
-
-@pytest.fixture
-def db_session(db_engine):
-    Session = sessionmaker(bind=db_engine)
-    session = Session()
-    yield session
-    session.close()
+from youtube_factory.models import Job
 
 @pytest.fixture
 def mock_storage(tmp_path):
@@ -29,7 +14,7 @@ def mock_storage(tmp_path):
         with patch.dict(os.environ, {"STORAGE_PATH": str(tmp_path)}):
             yield tmp_path
 
-def test_local_smoke_pipeline(db_session, mock_storage):
+def test_local_smoke_pipeline(db_session, mock_storage, stub_openai):
     # This test runs the pipeline function directly to ensure end-to-end logic works.
     # We mock external APIs.
     
@@ -48,7 +33,7 @@ def test_local_smoke_pipeline(db_session, mock_storage):
              patch("youtube_factory.worker.compose_video") as mock_compose, \
              patch("youtube_factory.worker.generate_thumbnail") as mock_thumb, \
              patch("youtube_factory.worker.upload_video") as mock_upload, \
-             patch("youtube_factory.worker.openai"): # Handle import
+             patch("youtube_factory.worker.redis_conn"):
 
             # Setup successful returns
             mock_gen.return_value = {
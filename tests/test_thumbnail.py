@@ -1,10 +1,14 @@
 import pytest
 from unittest.mock import MagicMock, patch
 from pathlib import Path
-from PIL import Image
 import os
+import threading
+from PIL import Image, ImageDraw
 
-from youtube_factory.tasks.thumbnail import generate_thumbnail
+from youtube_factory.tasks import thumbnail
+from youtube_factory.tasks.thumbnail import generate_thumbnail, _fit_text
+from _mock_helpers import mk_resp
+from _png import png_size
 
 @pytest.fixture
 def mock_storage(tmp_path):
@@ -24,13 +28,10 @@ def test_generate_thumbnail_pillow_fallback(sample_script, mock_storage):
     assert output_path.exists()
     assert output_path.suffix == ".png"
     
-    with Image.open(output_path) as img:
-        assert img.size == (1280, 720)
-        # Check format
-        assert img.format == "PNG"
+    assert png_size(output_path) == (1280, 720)
 
 @patch("youtube_factory.tasks.thumbnail.openai")
-@patch("youtube_factory.tasks.thumbnail.requests.get")
+@patch("youtube_factory.tasks.thumbnail._SESSION.get")
 def test_generate_thumbnail_ai_success(mock_get, mock_openai, sample_script, mock_storage):
     # Mock OpenAI client and response
     mock_client = MagicMock()
@@ -44,12 +45,7 @@ def test_generate_thumbnail_ai_success(mock_get, mock_openai, sample_script, moc
     mock_client.images.generate.return_value = mock_response
     
     # Mock image download
-    mock_download_resp = MagicMock()
-    mock_download_resp.status_code = 200
-    mock_download_resp.__enter__.return_value = mock_download_resp
-    mock_download_resp.__exit__.return_value = None
-    mock_download_resp.iter_content.return_value = [b"fake_ai_image_bytes"]
-    mock_get.return_value = mock_download_resp
+    mock_get.return_value = mk_resp(content_chunks=[b"fake_ai_image_bytes"])
     
     output_path = generate_thumbnail(sample_script, mock_storage, ai_image_api_key="sk-fake-key")
     
@@ -70,5 +66,57 @@ def test_generate_thumbnail_ai_failure_fallback(mock_openai, sample_script, mock
     
     # Should fall back to Pillow
     assert output_path.exists()
-    with Image.open(output_path) as img:
-        assert img.size == (1280, 720) # Pillow size
+    assert png_size(output_path) == (1280, 720) # Pillow size
+
+@patch("youtube_factory.tasks.thumbnail.AI_THUMBNAIL_DEADLINE", 0.05)
+@patch("youtube_factory.tasks.thumbnail.openai")
+def test_generate_thumbnail_ai_deadline_uses_pillow(mock_openai, sample_script, mock_storage):
+    release = threading.Event()
+    mock_client = MagicMock()
+    mock_openai.OpenAI.return_value = mock_client
+    mock_client.images.generate.side_effect = lambda **kw: release.wait(5) and None
+
+    output_path = generate_thumbnail(sample_script, mock_storage, ai_image_api_key="sk-fake-key")
+
+    assert png_size(output_path) == (1280, 720)
+    release.set()
+
+@pytest.mark.parametrize("text,max_h,start", [
+    ("HOW TO COOK PASTA FAST", 432, 150),
+    ("THE SECRETS OF THE UNIVERSE REVEALED TODAY", 432, 150),
+    ("You won't believe what happens next in this tutorial.", 144, 60),
+])
+def test_fit_text_picks_largest_fitting_size(text, max_h, start):
+    draw = ImageDraw.Draw(Image.new("RGB", (1280, 720)))
+    font, text_block, (left, top, right, bottom) = _fit_text(draw, text, 1160, max_h, start_size=start)
+
+    assert text_block.replace("\n", " ") == text
+    assert right - left <= 1160
+    if font.size < start:
+        # One step up must not fit, or the search stopped too early
+        bigger, _, _ = _fit_text(draw, text, 1160, max_h, start_size=font.size + 5)
+        assert bigger.size == font.size
+
+@pytest.mark.skipif(thumbnail._FONT_PATH is None, reason="no TrueType font on this host")
+def test_font_file_read_once_across_sizes(monkeypatch):
+    thumbnail._base_font.cache_clear()
+    thumbnail._get_font.cache_clear()
+    reads = []
+    real_read_bytes = Path.read_bytes
+    monkeypatch.setattr(Path, "read_bytes", lambda self: reads.append(self) or real_read_bytes(self))
+    getfont_sources = []
+    real_getfont = thumbnail.ImageFont.core.getfont
+    def getfont(font, *args):
+        getfont_sources.append(font)
+        return real_getfont(font, *args)
+    monkeypatch.setattr(thumbnail.ImageFont.core, "getfont", getfont)
+    try:
+        fonts = [thumbnail._get_font(40), thumbnail._get_font(60)]
+    finally:
+        thumbnail._base_font.cache_clear()
+        thumbnail._get_font.cache_clear()
+
+    assert [f.size for f in fonts] == [40, 60]
+    assert reads == [Path(thumbnail._FONT_PATH)]
+    # Every face (base and both sizes) came from the in-memory bytes, never the path
+    assert getfont_sources == ["", "", ""]
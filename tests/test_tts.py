@@ -2,7 +2,8 @@ import os
 import pytest
 from pathlib import Path
 from unittest.mock import MagicMock, patch
-from youtube_factory.tasks.tts import tts_from_text, TTSError
+from youtube_factory.tasks.tts import tts_from_text, TTSError, _split_text, _slugify, _polly_client
+from youtube_factory.utils import retry as retry_module
 
 @pytest.fixture
 def mock_storage(tmp_path):
@@ -17,91 +18,145 @@ def mock_http_client():
     client.post.return_value = response
     return client
 
-def test_tts_elevenlabs_success(mock_storage, mock_http_client):
-    with patch.dict(os.environ, {"ELEVENLABS_API_KEY": "fake_key"}):
+def test_tts_elevenlabs_success(mock_storage, mock_http_client, monkeypatch):
+    monkeypatch.setenv("ELEVENLABS_API_KEY", "fake_key")
+    output_path = tts_from_text(
+        "Hello world",
+        llm_client=mock_http_client,
+        storage_path=mock_storage
+    )
+    
+    assert output_path.exists()
+    assert output_path.stat().st_size > 0
+    with open(output_path, "rb") as f:
+        assert f.read() == b"fake_mp3_audio"
+        
+    mock_http_client.post.assert_called_once()
+    args, kwargs = mock_http_client.post.call_args
+    assert "api.elevenlabs.io" in args[0]
+
+def test_tts_fallback_to_polly(mock_storage, mock_http_client, monkeypatch):
+    # Simulate ElevenLabs failure or missing key
+    # Here we simulate missing ElevenLabs key but present AWS creds
+    monkeypatch.delenv("ELEVENLABS_API_KEY", raising=False)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "fake")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "fake")
+    # We need to mock boto3 inside the function module
+    _polly_client.cache_clear()
+    with patch("youtube_factory.tasks.tts.boto3") as mock_boto, \
+         patch("youtube_factory.tasks.tts.BotoConfig") as mock_config:
+        mock_polly = MagicMock()
+        mock_boto.client.return_value = mock_polly
+        
+        # Mock synthesize_speech response
+        mock_stream = MagicMock()
+        mock_stream.read.return_value = b"polly_audio"
+        mock_polly.synthesize_speech.return_value = {"AudioStream": mock_stream}
+        
         output_path = tts_from_text(
-            "Hello world",
+            "Hello Polly",
             llm_client=mock_http_client,
             storage_path=mock_storage
         )
         
         assert output_path.exists()
-        assert output_path.stat().st_size > 0
         with open(output_path, "rb") as f:
-            assert f.read() == b"fake_mp3_audio"
+            assert f.read() == b"polly_audio"
             
-        mock_http_client.post.assert_called_once()
-        args, kwargs = mock_http_client.post.call_args
-        assert "api.elevenlabs.io" in args[0]
+        mock_http_client.post.assert_not_called()
+        mock_polly.synthesize_speech.assert_called_once()
+        # Always the pooled client with adaptive retries
+        mock_config.assert_called_once_with(max_pool_connections=25, retries={"max_attempts": 3, "mode": "adaptive"})
+        mock_boto.client.assert_called_once_with("polly", config=mock_config.return_value)
+    _polly_client.cache_clear()
 
-def test_tts_fallback_to_polly(mock_storage, mock_http_client):
-    # Simulate ElevenLabs failure or missing key
-    # Here we simulate missing ElevenLabs key but present AWS creds
-    with patch.dict(os.environ, {
-        "AWS_ACCESS_KEY_ID": "fake",
-        "AWS_SECRET_ACCESS_KEY": "fake"
-    }, clear=True):
-        
-        # We need to mock boto3 inside the function module
-        with patch("youtube_factory.tasks.tts.boto3") as mock_boto:
-            mock_polly = MagicMock()
-            mock_boto.client.return_value = mock_polly
-            
-            # Mock synthesize_speech response
-            mock_stream = MagicMock()
-            mock_stream.read.return_value = b"polly_audio"
-            mock_polly.synthesize_speech.return_value = {"AudioStream": mock_stream}
-            
-            output_path = tts_from_text(
-                "Hello Polly",
-                llm_client=mock_http_client,
-                storage_path=mock_storage
-            )
-            
-            assert output_path.exists()
-            with open(output_path, "rb") as f:
-                assert f.read() == b"polly_audio"
-                
-            mock_http_client.post.assert_not_called()
-            mock_polly.synthesize_speech.assert_called_once()
-
-def test_tts_missing_creds(mock_storage, mock_http_client):
+def test_tts_missing_creds(mock_storage, mock_http_client, monkeypatch):
     # Ensure no keys
-    with patch.dict(os.environ, {}, clear=True):
-        with pytest.raises(EnvironmentError):
-            tts_from_text(
-                "Should fail",
-                llm_client=mock_http_client,
-                storage_path=mock_storage
-            )
+    for key in ("ELEVENLABS_API_KEY", "AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        monkeypatch.delenv(key, raising=False)
+    with pytest.raises(EnvironmentError):
+        tts_from_text(
+            "Should fail",
+            llm_client=mock_http_client,
+            storage_path=mock_storage
+        )
 
-def test_tts_elevenlabs_retry(mock_storage, mock_http_client):
-    with patch.dict(os.environ, {"ELEVENLABS_API_KEY": "fake_key"}):
-        # Fail twice then succeed
-        bad_response = MagicMock()
-        bad_response.status_code = 500
-        bad_response.text = "Internal Server Error"
-        
-        good_response = MagicMock()
-        good_response.status_code = 200
-        good_response.content = b"audio_after_retry"
-        
-        mock_http_client.post.side_effect = [bad_response, bad_response, good_response] # Actually side_effect on return value logic
-        # Wait, if I set return_value, it returns that. 
-        # But _call_elevenlabs raises TTSError if status != 200.
-        # My retry is on requests.RequestException or TTSError.
+def test_tts_elevenlabs_retry(mock_storage, mock_http_client, monkeypatch):
+    monkeypatch.setenv("ELEVENLABS_API_KEY", "fake_key")
+    # Don't actually wait out the backoff
+    monkeypatch.setattr(retry_module, "_sleep", lambda seconds: None)
+    # Fail twice then succeed
+    bad_response = MagicMock()
+    bad_response.status_code = 500
+    bad_response.text = "Internal Server Error"
+    
+    good_response = MagicMock()
+    good_response.status_code = 200
+    good_response.content = b"audio_after_retry"
+    
+    mock_http_client.post.side_effect = [bad_response, bad_response, good_response] # Actually side_effect on return value logic
+    # Wait, if I set return_value, it returns that. 
+    # But _call_elevenlabs raises TTSError if status != 200.
+    # My retry is on requests.RequestException or TTSError.
+    
+    # So I need to make .post return objects that trigger the check.
+    mock_http_client.post.side_effect = [bad_response, bad_response, good_response]
+
+    output_path = tts_from_text(
+        "Retry me",
+        llm_client=mock_http_client,
+        storage_path=mock_storage
+    )
+    
+    assert output_path.exists()
+    with open(output_path, "rb") as f:
+        assert f.read() == b"audio_after_retry"
         
-        # So I need to make .post return objects that trigger the check.
-        mock_http_client.post.side_effect = [bad_response, bad_response, good_response]
+    assert mock_http_client.post.call_count == 3
+
+def test_split_text_keeps_sentences_whole():
+    sentence = "This sentence is exactly forty chars ok."
+    text = " ".join([sentence] * 300)
+    chunks = _split_text(text, limit=4800)
+
+    assert len(chunks) > 1
+    assert all(len(c) <= 4800 for c in chunks)
+    assert all(c.endswith(".") for c in chunks)
+    assert " ".join(chunks) == text
+
+def test_split_text_short_and_overlong():
+    assert _split_text("Short.", limit=100) == ["Short."]
+    chunks = _split_text("word " * 50, limit=40)
+    assert all(len(c) <= 40 for c in chunks)
+    assert " ".join(chunks).split() == ["word"] * 50
+
+def test_tts_long_text_concats_with_stream_copy(mock_storage, mock_http_client, monkeypatch):
+    monkeypatch.setenv("ELEVENLABS_API_KEY", "fake_key")
+    calls = []
 
+    def fake_ffmpeg(args, input=None):
+        calls.append(args)
+        Path(args[-1]).write_bytes(input)
+
+    with patch("youtube_factory.tasks.tts.run_ffmpeg", side_effect=fake_ffmpeg):
         output_path = tts_from_text(
-            "Retry me",
+            "Sentence number one goes here. " * 400,
             llm_client=mock_http_client,
             storage_path=mock_storage
         )
-        
-        assert output_path.exists()
-        with open(output_path, "rb") as f:
-            assert f.read() == b"audio_after_retry"
-            
-        assert mock_http_client.post.call_count == 3
+
+    assert mock_http_client.post.call_count == 3
+    assert len(calls) == 1
+    assert calls[0][:4] == ["-f", "mp3", "-i", "pipe:0"]
+    assert "-c" in calls[0] and calls[0][calls[0].index("-c") + 1] == "copy"
+    assert output_path.read_bytes() == b"fake_mp3_audio" * 3
+    # Nothing but the output is written to storage
+    assert list(mock_storage.iterdir()) == [output_path]
+
+@pytest.mark.parametrize("text,expected", [
+    ("Hello, World!", "hello-world"),
+    ("  --Café über 2024 ", "cafe-uber-2024"),
+    ("日本", ""),
+])
+def test_slugify(text, expected):
+    assert _slugify(text) == expected
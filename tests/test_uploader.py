@@ -1,9 +1,12 @@
 import os
+import time
+import orjson
 import pytest
 from unittest.mock import MagicMock, patch, mock_open
 from pathlib import Path
 
-from youtube_factory.tasks.uploader import upload_video, UploadError, RetriableError
+from youtube_factory.tasks.uploader import upload_video, UploadError, RetriableError, _get_session
+from _mock_helpers import mk_resp
 
 @pytest.fixture
 def mock_storage(tmp_path):
@@ -18,46 +21,48 @@ def mock_paths(mock_storage):
     return v, t
 
 @patch("youtube_factory.tasks.uploader._save_pending_upload")
-def test_upload_missing_credentials(mock_save, mock_paths):
+def test_upload_missing_credentials(mock_save, mock_paths, monkeypatch):
     v, t = mock_paths
     mock_save.return_value = 123
     
     # Ensure no creds in env
-    with patch.dict(os.environ, {}, clear=True):
-        result = upload_video(v, t, "Title", "Desc", ["tag"], credentials=None)
+    for key in ("YOUTUBE_CLIENT_ID", "YOUTUBE_CLIENT_SECRET", "YOUTUBE_REFRESH_TOKEN"):
+        monkeypatch.delenv(key, raising=False)
+    result = upload_video(v, t, "Title", "Desc", ["tag"], credentials=None)
         
     assert result["status"] == "pending_upload"
     assert result["metadata_id"] == 123
     mock_save.assert_called_once()
 
-@patch("youtube_factory.tasks.uploader.requests.post")
-@patch("youtube_factory.tasks.uploader.requests.put")
-def test_upload_success(mock_put, mock_post, mock_paths):
+@pytest.fixture
+def mock_session():
+    session = MagicMock()
+    with patch("youtube_factory.tasks.uploader._get_session", return_value=session):
+        yield session
+
+def _record_put_bodies(put_mock, responses):
+    """Snapshots each PUT body as it is sent; chunk views are released once the PUT returns."""
+    bodies = []
+    def put(*args, **kwargs):
+        bodies.append(bytes(kwargs["data"]))
+        return responses.pop(0)
+    put_mock.side_effect = put
+    return bodies
+
+def test_upload_success(mock_session, mock_paths):
     v, t = mock_paths
-    
-    # Mock Token Response
-    mock_token_resp = MagicMock()
-    mock_token_resp.status_code = 200
-    mock_token_resp.json.return_value = {"access_token": "fake_token"}
-    
-    # Mock Init Upload Response
-    mock_init_resp = MagicMock()
-    mock_init_resp.status_code = 200
-    mock_init_resp.headers = {"Location": "http://upload.url"}
-    
-    # Mock Thumbnail Response
-    mock_thumb_resp = MagicMock()
-    mock_thumb_resp.status_code = 200
+    mock_post, mock_put = mock_session.post, mock_session.put
     
     # Side effect for post: Token -> Init -> Thumbnail
-    # Note: requests.post called for token (1), init upload (2), thumbnail (3)
-    mock_post.side_effect = [mock_token_resp, mock_init_resp, mock_thumb_resp]
+    # Note: session.post called for token (1), init upload (2), thumbnail (3)
+    mock_post.side_effect = [
+        mk_resp(json_body={"access_token": "fake_token"}),
+        mk_resp(headers={"Location": "http://upload.url"}),
+        mk_resp()
+    ]
     
     # Mock Put (Upload Bytes) Response
-    mock_put_resp = MagicMock()
-    mock_put_resp.status_code = 200
-    mock_put_resp.json.return_value = {"id": "vid_123"}
-    mock_put.return_value = mock_put_resp
+    bodies = _record_put_bodies(mock_put, [mk_resp(json_body={"id": "vid_123"})])
     
     creds = {
         "YOUTUBE_CLIENT_ID": "cid", 
@@ -72,22 +77,27 @@ def test_upload_success(mock_put, mock_post, mock_paths):
     
     assert mock_post.call_count == 3
     assert mock_put.call_count == 1
+    # Small file: one chunk covering the whole range
+    size = v.stat().st_size
+    put_kwargs = mock_put.call_args.kwargs
+    assert put_kwargs["headers"]["Content-Range"] == f"bytes 0-{size - 1}/{size}"
+    assert bodies == [v.read_bytes()]
+    init_kwargs = mock_post.call_args_list[1].kwargs
+    assert orjson.loads(init_kwargs["data"])["snippet"]["title"] == "Title"
+    assert init_kwargs["headers"]["Content-Length"] == str(len(init_kwargs["data"]))
+    thumb_kwargs = mock_post.call_args_list[2].kwargs
+    assert thumb_kwargs["data"] == t.read_bytes()
+    assert thumb_kwargs["headers"]["Content-Length"] == str(t.stat().st_size)
 
-@patch("youtube_factory.tasks.uploader.requests.post")
-def test_upload_quota_error(mock_post, mock_paths):
+def test_upload_quota_error(mock_session, mock_paths):
     v, t = mock_paths
+    mock_post = mock_session.post
     
-    # Mock Token Response (Success)
-    mock_token_resp = MagicMock()
-    mock_token_resp.status_code = 200
-    mock_token_resp.json.return_value = {"access_token": "fake_token"}
-    
-    # Mock Init Upload Response (403 Quota)
-    mock_init_resp = MagicMock()
-    mock_init_resp.status_code = 403
-    mock_init_resp.text = "Quota Exceeded"
-    
-    mock_post.side_effect = [mock_token_resp, mock_init_resp]
+    # Token succeeds, init upload hits the quota (403)
+    mock_post.side_effect = [
+        mk_resp(json_body={"access_token": "fake_token"}),
+        mk_resp(status=403, text="Quota Exceeded")
+    ]
     
     creds = {
         "YOUTUBE_CLIENT_ID": "cid", 
@@ -99,3 +109,89 @@ def test_upload_quota_error(mock_post, mock_paths):
         upload_video(v, t, "Title", "Desc", ["tag"], credentials=creds)
         
     assert "Failed to initiate upload" in str(excinfo.value)
+
+def test_get_session_is_shared():
+    assert _get_session() is _get_session()
+
+@patch("youtube_factory.tasks.uploader.backoff_delay", return_value=0)
+@patch("youtube_factory.tasks.uploader.UPLOAD_CHUNK_SIZE", 8)
+def test_upload_resumes_chunks_after_server_error(mock_backoff, mock_session, mock_paths):
+    v, t = mock_paths  # 18 bytes -> chunks of 8
+    mock_session.post.side_effect = [
+        mk_resp(json_body={"access_token": "fake_token"}),
+        mk_resp(headers={"Location": "http://upload.url"}),
+        mk_resp()
+    ]
+    bodies = _record_put_bodies(mock_session.put, [
+        mk_resp(status=308, headers={"Range": "bytes=0-7"}),
+        mk_resp(status=503),
+        # Status query: server kept only part of the failed chunk
+        mk_resp(status=308, headers={"Range": "bytes=0-11"}),
+        mk_resp(json_body={"id": "vid_123"}),
+    ])
+    creds = {
+        "YOUTUBE_CLIENT_ID": "cid",
+        "YOUTUBE_CLIENT_SECRET": "csec",
+        "YOUTUBE_REFRESH_TOKEN": "rtok"
+    }
+
+    result = upload_video(v, t, "Title", "Desc", ["tag"], credentials=creds)
+
+    assert result["videoId"] == "vid_123"
+    ranges = [c.kwargs["headers"]["Content-Range"] for c in mock_session.put.call_args_list]
+    assert ranges == ["bytes 0-7/18", "bytes 8-15/18", "bytes */18", "bytes 12-17/18"]
+    content = v.read_bytes()
+    assert bodies == [content[:8], content[8:16], b"", content[12:]]
+
+def test_upload_retries_rate_limited_init(mock_session, mock_paths, monkeypatch):
+    from youtube_factory.tasks import uploader
+    monkeypatch.setattr(uploader._upload_file_resumable.retry, "sleep", lambda seconds: None)
+    v, t = mock_paths
+    mock_session.post.side_effect = [
+        mk_resp(json_body={"access_token": "fake_token"}),
+        mk_resp(status=429, text="rateLimitExceeded"),
+        mk_resp(headers={"Location": "http://upload.url"}),
+        mk_resp()
+    ]
+    mock_session.put.return_value = mk_resp(json_body={"id": "vid_123"})
+    creds = {
+        "YOUTUBE_CLIENT_ID": "cid",
+        "YOUTUBE_CLIENT_SECRET": "csec",
+        "YOUTUBE_REFRESH_TOKEN": "rtok"
+    }
+
+    result = upload_video(v, t, "Title", "Desc", ["tag"], credentials=creds)
+
+    assert result["videoId"] == "vid_123"
+    assert mock_session.post.call_count == 4
+
+def test_db_session_factory_built_once(monkeypatch):
+    from sqlalchemy import create_engine
+    from youtube_factory.tasks import uploader
+    monkeypatch.setenv("DATABASE_URL", "sqlite://")
+    uploader._session_factory.cache_clear()
+    try:
+        with patch("youtube_factory.tasks.uploader.create_engine", wraps=create_engine) as mock_create, \
+             patch("youtube_factory.models.Base.metadata.create_all") as mock_create_all:
+            uploader._get_db_session().close()
+            uploader._get_db_session().close()
+        mock_create.assert_called_once()
+        # Schema creation is a startup step (init_db), never per upload
+        mock_create_all.assert_not_called()
+    finally:
+        uploader._session_factory.cache_clear()
+
+def test_access_token_cached_until_expiry(mock_session, monkeypatch):
+    from youtube_factory.tasks import uploader
+    monkeypatch.setattr(uploader, "_TOKEN_CACHE", {})
+    mock_session.post.return_value = mk_resp(json_body={"access_token": "tok", "expires_in": 3599})
+
+    assert uploader._get_access_token("cid", "csec", "rtok") == "tok"
+    assert uploader._get_access_token("cid", "csec", "rtok") == "tok"
+    assert mock_session.post.call_count == 1
+
+    # Inside the expiry margin: refreshed again
+    key = ("cid", "rtok")
+    uploader._TOKEN_CACHE[key] = ("old", time.time() + 30)
+    assert uploader._get_access_token("cid", "csec", "rtok") == "tok"
+    assert mock_session.post.call_count == 2
@@ -1,27 +1,11 @@
 import pytest
 from unittest.mock import MagicMock, patch
 import json
+import threading
 from youtube_factory.worker import run_pipeline, enqueue_job, Job
-from youtube_factory.models import Base
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
-# Use in-memory SQLite for tests
-@pytest.fixture(scope="module")
-def db_engine():
-    engine = create_engine("sqlite:///:memory:")
-    Base.metadata.create_all(engine)
-    return engine
-
-@pytest.fixture
-def db_session(db_engine):
-    Session = sessionmaker(bind=db_engine)
-    session = Session()
-    yield session
-    session.close()
 
 @pytest.fixture
-def mock_tasks(db_session):
+def mock_tasks(db_session, stub_openai):
     # Create a proxy for the session that ignores close()
     real_session = db_session
     session_proxy = MagicMock(wraps=real_session)
@@ -38,8 +22,7 @@ def mock_tasks(db_session):
          patch("youtube_factory.worker.upload_video") as mock_upload, \
          patch("youtube_factory.worker.redis_conn") as mock_redis, \
          patch("youtube_factory.worker.queue") as mock_queue, \
-         patch("youtube_factory.worker.SessionLocal") as mock_session_maker, \
-         patch("youtube_factory.worker.openai"): # Mock openai module import/usage
+         patch("youtube_factory.worker.SessionLocal") as mock_session_maker:
         
         # Setup mocks
         mock_gen.return_value = {
@@ -58,7 +41,7 @@ def mock_tasks(db_session):
             "gen": mock_gen, "tts": mock_tts, "assets": mock_assets, 
             "compose": mock_compose, "thumb": mock_thumb, "upload": mock_upload,
             "session_maker": mock_session_maker, "queue": mock_queue,
-            "session_proxy": session_proxy
+            "session_proxy": session_proxy, "redis": mock_redis
         }
 
 def test_enqueue_job(mock_tasks, db_session):
@@ -102,6 +85,18 @@ def test_run_pipeline_success(mock_tasks, db_session):
     db_session.refresh(job)
     assert job.status == "completed"
     assert job.metadata_json["upload_result"]["videoId"] == "123"
+    assert job.metadata_json["video_path"] == "path/to/final.mp4"
+    # One session carries every status write for the run
+    job_sessions = [c for c in mock_tasks["session_maker"].call_args_list if c.kwargs.get("expire_on_commit") is False]
+    assert len(job_sessions) == 1
+    
+    # Intermediate stages only go to Redis
+    pipe = mock_tasks["redis"].pipeline.return_value
+    stages = [c.kwargs["mapping"]["stage"] for c in pipe.hset.call_args_list]
+    assert stages == [
+        "processing", "script_generated", "tts_complete", "assets_ready",
+        "video_composed", "thumbnail_ready", "completed"
+    ]
 
 def test_run_pipeline_failure(mock_tasks, db_session):
     # mock_tasks["session_maker"].return_value = db_session # Handled in fixture
@@ -119,3 +114,38 @@ def test_run_pipeline_failure(mock_tasks, db_session):
     db_session.refresh(job)
     assert job.status == "failed"
     assert "Generation Failed" in job.metadata_json["error"]
+
+def test_run_pipeline_reuses_cached_script(mock_tasks, db_session):
+    for topic in ("Cached Topic", "  cached   TOPIC "):
+        job = Job(niche="Test", topic_hint=topic, status="queued")
+        db_session.add(job)
+        db_session.commit()
+        run_pipeline(job.id, topic, "Test", "en", "alloy", 60)
+    
+    # Second run normalizes to the same key and skips the LLM
+    mock_tasks["gen"].assert_called_once()
+    assert mock_tasks["tts"].call_count == 2
+
+def test_run_pipeline_overlaps_tts_assets_thumbnail(mock_tasks, db_session):
+    job = Job(niche="Test", topic_hint="Overlap", status="queued")
+    db_session.add(job)
+    db_session.commit()
+
+    # Each stage only returns once all three are running; serial stages would time out
+    all_started = threading.Barrier(3, timeout=5)
+    def stage(result):
+        def run(*args, **kwargs):
+            all_started.wait()
+            return result
+        return run
+    mock_tasks["tts"].side_effect = stage("path/to/voice.mp3")
+    mock_tasks["assets"].side_effect = stage(["path/to/asset.png"])
+    mock_tasks["thumb"].side_effect = stage("path/to/thumb.png")
+
+    run_pipeline(job.id, "Overlap", "Test", "en", "alloy", 60)
+
+    db_session.refresh(job)
+    assert job.status == "completed"
+    assert job.metadata_json["voice_path"] == "path/to/voice.mp3"
+    assert job.metadata_json["assets"] == ["path/to/asset.png"]
+    assert job.metadata_json["thumbnail_path"] == "path/to/thumb.png"
@@ -1,16 +1,22 @@
 import os
+import hmac
+from html import escape
+from string import Template
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+import orjson
 from fastapi import FastAPI, Depends, HTTPException, Header, Security
 from fastapi.security import APIKeyHeader
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from rq import Queue
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
 from starlette.status import HTTP_403_FORBIDDEN
 
 from youtube_factory.models import Job
-from youtube_factory.worker import run_pipeline, queue, SessionLocal, engine
+from youtube_factory.worker import run_pipeline, queue, read_progress, SessionLocal, engine
 
 # Init FastAPI
 app = FastAPI(title="YouTube Factory Monitor")
@@ -37,9 +43,12 @@ MONITOR_API_KEY = os.environ.get("MONITOR_API_KEY")
 
 api_key_scheme = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 
-def get_api_key(api_key_header: Optional[str] = Security(api_key_scheme)):
+# async so FastAPI awaits it inline instead of dispatching to the threadpool
+async def get_api_key(api_key_header: Optional[str] = Security(api_key_scheme)):
     if MONITOR_API_KEY:
-        if api_key_header != MONITOR_API_KEY:
+        if not api_key_header or not hmac.compare_digest(
+            api_key_header.encode(), MONITOR_API_KEY.encode()
+        ):
             raise HTTPException(
                 status_code=HTTP_403_FORBIDDEN, detail="Could not validate credentials"
             )
@@ -63,37 +72,64 @@ class JobSummary(BaseModel):
     class Config:
         from_attributes = True
 
+class JobDetail(JobSummary):
+    updated_at: Optional[datetime]
+    metadata_json: Optional[Dict[str, Any]]
+    # Live pipeline stage from the worker (Redis); None once it has expired
+    progress: Optional[Dict[str, str]] = None
+
+# Columns behind JobSummary; listing pages skip loading the metadata JSON blob
+JOB_SUMMARY_COLUMNS = (Job.id, Job.status, Job.niche, Job.topic_hint, Job.created_at)
+
 # Routes
 
+# Non-blocking, so async: served on the event loop without a threadpool hop.
+# DB-backed routes stay sync because the ORM session is blocking.
 @app.get("/health")
-def health_check():
+async def health_check():
     return {"status": "ok"}
 
+# Rows are streamed off a server-side cursor in batches of this size, so only
+# a window of the result is ever resident regardless of `limit`
+JOB_STREAM_BATCH = 100
+
+def _stream_json_rows(db: Session, stmt):
+    yield b"["
+    sep = b""
+    for row in db.execute(stmt.execution_options(yield_per=JOB_STREAM_BATCH)):
+        # orjson writes datetimes as ISO 8601, same as the JobSummary model
+        yield sep + orjson.dumps(row._asdict())
+        sep = b","
+    yield b"]"
+
+# The body is produced after the handler returns; FastAPI >= 0.118 keeps the
+# get_db session open until it has been sent
 @app.get("/jobs", response_model=List[JobSummary], dependencies=[Depends(get_api_key)])
 def list_jobs(skip: int = 0, limit: int = 20, db: Session = Depends(get_db)):
-    jobs = db.query(Job).order_by(Job.created_at.desc()).offset(skip).limit(limit).all()
-    # Manual conversion if needed or pydantic handles it. 
-    # created_at is datetime, pydantic handles it to ISO string usually.
-    return jobs
+    stmt = select(*JOB_SUMMARY_COLUMNS).order_by(Job.created_at.desc()).offset(skip).limit(limit)
+    return StreamingResponse(_stream_json_rows(db, stmt), media_type="application/json")
 
-@app.get("/jobs/{job_id}", dependencies=[Depends(get_api_key)])
+# With a response_model, FastAPI serialises through pydantic-core straight to
+# JSON bytes instead of walking the ORM object with jsonable_encoder
+@app.get("/jobs/{job_id}", response_model=JobDetail, dependencies=[Depends(get_api_key)])
 def get_job_details(job_id: int, db: Session = Depends(get_db)):
-    job = db.query(Job).filter(Job.id == job_id).first()
+    job = db.get(Job, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    return job
+    detail = JobDetail.model_validate(job)
+    detail.progress = read_progress([job_id]).get(job_id)
+    return detail
 
 @app.post("/enqueue", dependencies=[Depends(get_api_key)])
 def enqueue_job_endpoint(req: JobRequest, db: Session = Depends(get_db)):
-    # Create Job record
-    job = Job(
-        niche=req.niche,
-        topic_hint=req.topic,
-        status="queued"
-    )
-    db.add(job)
+    # Create Job record; RETURNING hands back the id in the same round-trip,
+    # so no follow-up SELECT (refresh) and no ORM object for a write-only path
+    job_id = db.execute(
+        insert(Job)
+        .values(niche=req.niche, topic_hint=req.topic, status="queued")
+        .returning(Job.id)
+    ).scalar_one()
     db.commit()
-    db.refresh(job)
     
     # Enqueue in RQ
     # mimicking parameters from worker.py: enqueue_job
@@ -107,7 +143,7 @@ def enqueue_job_endpoint(req: JobRequest, db: Session = Depends(get_db)):
     
     queue.enqueue(
         run_pipeline,
-        job_id=job.id,
+        job_id=job_id,
         topic=req.topic,
         niche=req.niche,
         language=req.language,
@@ -116,36 +152,56 @@ def enqueue_job_endpoint(req: JobRequest, db: Session = Depends(get_db)):
         job_timeout='1h'
     )
     
-    return {"status": "queued", "job_id": job.id}
+    return {"status": "queued", "job_id": job_id}
+
+@app.post("/enqueue/batch", dependencies=[Depends(get_api_key)])
+def enqueue_jobs_batch(reqs: List[JobRequest], db: Session = Depends(get_db)):
+    if not reqs:
+        return {"status": "queued", "job_ids": []}
+    # One multi-row INSERT ... RETURNING for the whole batch, like /enqueue:
+    # no per-row refresh SELECT to read the ids back. RETURNING order isn't
+    # guaranteed, but autoincrement ids are assigned in row order, so sorted
+    # ids line up with `reqs`. (sort_by_parameter_order would fall back to one
+    # INSERT per row on SQLite, which has no insert sentinel.)
+    job_ids = sorted(db.scalars(
+        insert(Job).returning(Job.id),
+        [dict(niche=r.niche, topic_hint=r.topic, status="queued") for r in reqs],
+    ))
+    db.commit()
 
-@app.get("/", response_class=HTMLResponse, dependencies=[Depends(get_api_key)])
-def dashboard(db: Session = Depends(get_db)):
-    jobs = db.query(Job).order_by(Job.created_at.desc()).limit(50).all()
-    
-    rows = ""
-    for j in jobs:
-        rows += f"""
-        <tr>
-            <td><a href="/jobs/{j.id}">{j.id}</a></td>
-            <td>{j.status}</td>
-            <td>{j.niche}</td>
-            <td>{j.topic_hint}</td>
-            <td>{j.created_at}</td>
-        </tr>
-        """
-    
-    html_content = f"""
+    # enqueue_many writes every job through one Redis pipeline, so a burst of
+    # N jobs costs a single round-trip instead of N.
+    queue.enqueue_many([
+        Queue.prepare_data(
+            run_pipeline,
+            kwargs=dict(
+                job_id=job_id,
+                topic=r.topic,
+                niche=r.niche,
+                language=r.language,
+                voice_profile=r.voice_profile,
+                length=r.length,
+            ),
+            timeout='1h',
+        )
+        for job_id, r in zip(job_ids, reqs)
+    ])
+
+    return {"status": "queued", "job_ids": job_ids}
+
+# Page shell is parsed once at import; only the rows change per request
+DASHBOARD_TEMPLATE = Template("""
     <html>
         <head>
             <title>YouTube Factory Monitor</title>
             <style>
-                body {{ font-family: sans-serif; padding: 20px; }}
-                table {{ border-collapse: collapse; width: 100%; }}
-                th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-                th {{ background-color: #f2f2f2; }}
-                tr:nth-child(even) {{ background-color: #f9f9f9; }}
-                a {{ text-decoration: none; color: #007bff; }}
-                a:hover {{ text-decoration: underline; }}
+                body { font-family: sans-serif; padding: 20px; }
+                table { border-collapse: collapse; width: 100%; }
+                th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+                th { background-color: #f2f2f2; }
+                tr:nth-child(even) { background-color: #f9f9f9; }
+                a { text-decoration: none; color: #007bff; }
+                a:hover { text-decoration: underline; }
             </style>
         </head>
         <body>
@@ -155,16 +211,37 @@ def dashboard(db: Session = Depends(get_db)):
                     <tr>
                         <th>ID</th>
                         <th>Status</th>
+                        <th>Stage</th>
                         <th>Niche</th>
                         <th>Topic</th>
                         <th>Created At</th>
                     </tr>
                 </thead>
                 <tbody>
-                    {rows}
+                    $rows
                 </tbody>
             </table>
         </body>
     </html>
-    """
-    return html_content
+    """)
+
+@app.get("/", response_class=HTMLResponse, dependencies=[Depends(get_api_key)])
+def dashboard(db: Session = Depends(get_db)):
+    jobs = db.execute(select(*JOB_SUMMARY_COLUMNS).order_by(Job.created_at.desc()).limit(50)).all()
+    progress = read_progress(j.id for j in jobs)
+    
+    rows = "".join(
+        f"""
+        <tr>
+            <td><a href="/jobs/{j.id}">{j.id}</a></td>
+            <td>{escape(str(j.status))}</td>
+            <td>{escape(progress.get(j.id, {}).get("stage", ""))}</td>
+            <td>{escape(str(j.niche))}</td>
+            <td>{escape(str(j.topic_hint))}</td>
+            <td>{j.created_at}</td>
+        </tr>
+        """
+        for j in jobs
+    )
+    
+    return DASHBOARD_TEMPLATE.substitute(rows=rows)
@@ -1,10 +1,30 @@
 from datetime import datetime
 from typing import Optional, Any
-from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, Boolean, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import declarative_base
+import orjson
 
 Base = declarative_base()
 
+
+def _json_dumps(obj: Any) -> str:
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+# create_engine(..., **JSON_ENGINE_KWARGS): JSON/JSONB columns (job metadata,
+# cached scripts) are encoded and decoded with orjson instead of stdlib json
+JSON_ENGINE_KWARGS = {"json_serializer": _json_dumps, "json_deserializer": orjson.loads}
+
+
+def init_db(engine) -> None:
+    """
+    Creates any missing tables. A one-time startup step (the worker runs it
+    on import); request-time code paths assume the schema already exists.
+    """
+    Base.metadata.create_all(engine)
+
+
 class Job(Base):
     """
     Represents a video generation job.
@@ -17,11 +37,21 @@ class Job(Base):
     topic_hint = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    metadata_json = Column(JSON, nullable=True, name="metadata")  # 'metadata' is reserved in Base
+    # JSONB on Postgres: stored pre-parsed and GIN-indexable; plain JSON elsewhere (SQLite)
+    metadata_json = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True, name="metadata")  # 'metadata' is reserved in Base
+
+    # Listings are always "ORDER BY created_at DESC LIMIT n", optionally filtered by status
+    __table_args__ = (
+        Index("ix_jobs_created_at_desc", created_at.desc()),
+        Index("ix_jobs_status_created_at", status, created_at.desc()),
+        # Containment/key lookups into metadata (e.g. metadata @> '{"upload_result": {...}}')
+        Index("ix_jobs_metadata_gin", metadata_json, postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
 
     def __repr__(self):
         return f"<Job(id={self.id}, status={self.status})>"
 
+
 class PendingUpload(Base):
     """
     Represents an upload that couldn't be completed immediately.
@@ -37,4 +67,22 @@ class PendingUpload(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     def __repr__(self):
-        return f"<PendingUpload(id={self.id}, title={self.title})>"
\ No newline at end of file
+        return f"<PendingUpload(id={self.id}, title={self.title})>"
+
+
+class ScriptCache(Base):
+    """
+    Generated scripts keyed by normalized (topic, language, length), so repeat
+    topics skip the LLM call.
+    """
+    __tablename__ = "script_cache"
+
+    cache_key = Column(String(64), primary_key=True)  # sha256 hex, see script_gen.script_cache_key
+    topic = Column(Text, nullable=False)
+    language = Column(String, nullable=False)
+    length_seconds = Column(Integer, nullable=False)
+    script_json = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False, name="script")
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ScriptCache(topic={self.topic!r}, language={self.language})>"
@@ -1,8 +1,14 @@
 import os
+import hashlib
 import logging
 import uuid
+import shutil
 import textwrap
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Optional, Any
 
@@ -10,6 +16,18 @@ from PIL import Image, ImageDraw, ImageFont
 
 logger = logging.getLogger(__name__)
 
+# Sections are fetched concurrently; each one is almost entirely network wait
+MAX_ASSET_WORKERS = 8
+
+# One pooled session for Pexels search and downloads: keeps TCP/TLS
+# connections alive across sections and jobs instead of a handshake per call.
+# Sized so every concurrent section gets its own pooled connection.
+_SESSION = requests.Session()
+_SESSION.headers.update({"User-Agent": "youtube-factory/1.0"})
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_ASSET_WORKERS)
+_SESSION.mount("https://", _adapter)
+_SESSION.mount("http://", _adapter)
+
 def _get_job_id(script_obj: Dict) -> str:
     """Generate or retrieve a job ID from the script object."""
     # If the script object had an ID field we would use it, otherwise generate one.
@@ -18,13 +36,17 @@ def _get_job_id(script_obj: Dict) -> str:
     slug = "".join(c if c.isalnum() else "_" for c in title)[:20]
     return f"{slug}_{uuid.uuid4().hex[:8]}"
 
+# 1 MiB copies: fewer read/write syscalls than 8 KiB iter_content chunks
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
 def _download_file(url: str, dest_path: Path):
     """Download a file from a URL to a destination path."""
-    with requests.get(url, stream=True) as r:
+    with _SESSION.get(url, stream=True) as r:
         r.raise_for_status()
+        # Reading r.raw directly skips requests' decoding; have urllib3 undo any gzip
+        r.raw.decode_content = True
         with open(dest_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
+            shutil.copyfileobj(r.raw, f, DOWNLOAD_CHUNK_SIZE)
 
 def _search_pexels_video(query: str, api_key: str) -> Optional[str]:
     """Search Pexels for a video and return the download URL of the first match."""
@@ -37,7 +59,7 @@ def _search_pexels_video(query: str, api_key: str) -> Optional[str]:
         "size": "medium" # reasonable size for preview/MVP
     }
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
+        response = _SESSION.get(url, headers=headers, params=params, timeout=10)
         response.raise_for_status()
         data = response.json()
         if data.get("videos"):
@@ -58,47 +80,150 @@ def _search_pexels_video(query: str, api_key: str) -> Optional[str]:
         logger.warning(f"Pexels API failed for query '{query}': {e}")
         return None
 
+def _load_font(name: str, size: int) -> ImageFont.ImageFont:
+    """Load a TTF by name, falling back to Pillow's bundled scalable font."""
+    try:
+        return ImageFont.truetype(name, size)
+    except OSError:
+        return ImageFont.load_default(size=size)
+
+# Fonts and the wrapper are immutable once built; load them once per process
+# instead of once per slide.
+_FONT_HEADING = _load_font("DejaVuSans-Bold.ttf", 56)
+_FONT_BODY = _load_font("DejaVuSans.ttf", 36)
+_BODY_WRAPPER = textwrap.TextWrapper(width=50) # Approximated char width at 36px
+
+# Every slide starts from the same solid background; render it once and
+# copy it (a single memcpy) per slide instead of allocating and filling anew
+_BASE_PLATE = Image.new("RGB", (1280, 720), color=(20, 20, 20))
+
 def _create_slide_image(text: str, heading: str, dest_path: Path):
     """Create a simple slide image using Pillow."""
-    width, height = 1280, 720
-    bg_color = (20, 20, 20)
     text_color = (255, 255, 255)
     
-    img = Image.new("RGB", (width, height), color=bg_color)
+    img = _BASE_PLATE.copy()
     draw = ImageDraw.Draw(img)
-    
-    # Try to load a font, fallback to default
-    try:
-        # Provide a path to a font if known, or use load_default
-        # For better looking slides, a TTF would be needed, but for MVP:
-        font_heading = ImageFont.load_default()
-        font_body = ImageFont.load_default()
-        # Scale logic would be needed for default font which is tiny
-        # Pillow's default font is bitmap and doesn't scale well.
-        # Ideally we'd look for system fonts.
-    except IOError:
-        font_heading = ImageFont.load_default()
-        font_body = ImageFont.load_default()
 
     # Layout
     margin = 100
     
     # Draw Heading
-    # Since default font is small, this is a placeholder visual.
-    # In a real app we'd bundle a .ttf file.
-    draw.text((margin, margin), heading.upper(), font=font_heading, fill=(255, 215, 0))
+    draw.text((margin, margin), heading.upper(), font=_FONT_HEADING, fill=(255, 215, 0))
     
-    # Wrap and Draw Body
-    wrapper = textwrap.TextWrapper(width=60) # Approximated char width
-    lines = wrapper.wrap(text)
-    
-    y_text = margin + 50
-    for line in lines:
-        draw.text((margin, y_text), line, font=font_body, fill=text_color)
-        y_text += 15 # Line height for default font
+    # Wrap and Draw Body in a single call
+    body = "\n".join(_BODY_WRAPPER.wrap(text))
+    draw.multiline_text((margin, margin + 100), body, font=_FONT_BODY, fill=text_color, spacing=10)
 
     img.save(dest_path)
 
+# The clip cache is bounded: entries unused for ASSET_CACHE_MAX_AGE are misses
+# and get deleted, and the least recently used go first once the directory
+# passes ASSET_CACHE_MAX_BYTES. A hit refreshes the entry's mtime.
+ASSET_CACHE_MAX_AGE = int(os.environ.get("ASSET_CACHE_MAX_AGE_SECONDS", 7 * 24 * 3600))
+ASSET_CACHE_MAX_BYTES = int(os.environ.get("ASSET_CACHE_MAX_BYTES", 5 * 1024 ** 3))
+_PRUNE_LOCK = threading.Lock()
+
+def _cached_clip_path(cache_dir: Path, query: str) -> Path:
+    """Cache location for the clip a b-roll query resolves to."""
+    key = hashlib.sha256(query.strip().lower().encode("utf-8")).hexdigest()
+    return cache_dir / f"{key}.mp4"
+
+def _link_or_copy(src: Path, dest: Path):
+    """Hardlink src to dest, copying when the filesystem can't link."""
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+def _prune_clip_cache(cache_dir: Path, keep: Path):
+    """
+    Deletes expired clips (and abandoned partial downloads), then the least
+    recently used until the cache fits ASSET_CACHE_MAX_BYTES. `keep`, the
+    clip just written, is never evicted. Jobs hold hardlinks or copies, so
+    deleting a cache entry never touches an asset already handed out.
+    """
+    # One pruner per process is enough; a concurrent writer just skips it
+    if not _PRUNE_LOCK.acquire(blocking=False):
+        return
+    try:
+        cutoff = time.time() - ASSET_CACHE_MAX_AGE
+        entries = []
+        for path in cache_dir.iterdir():
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            if st.st_mtime < cutoff and path != keep:
+                path.unlink(missing_ok=True)
+            elif path.suffix == ".mp4":
+                entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= ASSET_CACHE_MAX_BYTES:
+                break
+            if path != keep:
+                path.unlink(missing_ok=True)
+                total -= size
+    finally:
+        _PRUNE_LOCK.release()
+
+def _fetch_clip(query: str, api_key: str, cache_dir: Path) -> Optional[Path]:
+    """
+    Returns a cached clip for the query, searching Pexels and downloading
+    into the cache on a miss. None if Pexels has no usable match.
+    """
+    cached = _cached_clip_path(cache_dir, query)
+    try:
+        fresh = cached.stat().st_mtime >= time.time() - ASSET_CACHE_MAX_AGE
+    except FileNotFoundError:
+        fresh = False
+    if fresh:
+        logger.info(f"Using cached clip for: {query}")
+        os.utime(cached)
+        return cached
+    
+    logger.info(f"Searching Pexels for: {query}")
+    video_url = _search_pexels_video(query, api_key)
+    if not video_url:
+        return None
+    
+    # Download under a unique name and rename into place, so a concurrent
+    # reader never sees a partial file under the cache key
+    part = cached.with_name(f"{cached.name}.{uuid.uuid4().hex}.part")
+    try:
+        _download_file(video_url, part)
+        os.replace(part, cached)
+    finally:
+        part.unlink(missing_ok=True)
+    _prune_clip_cache(cache_dir, keep=cached)
+    return cached
+
+def _build_section_asset(i: int, section: Dict, asset_dir: Path, cache_dir: Path, pexels_api_key: Optional[str]) -> Path:
+    """Download a stock clip for one section, or render a slide if none is usable."""
+    index_prefix = f"{i+1:02d}"
+    heading = section.get("heading", "")
+    body = section.get("body", "")
+    b_roll_query = section.get("b_roll", heading) # Use heading if b_roll empty
+    
+    if pexels_api_key:
+        try:
+            clip = _fetch_clip(b_roll_query, pexels_api_key, cache_dir)
+            if clip:
+                target_path = asset_dir / f"{index_prefix}_clip.mp4"
+                _link_or_copy(clip, target_path)
+                return target_path
+        except Exception as e:
+            logger.error(f"Failed to download video: {e}")
+            # Fallback to slide if download fails
+    
+    # Fallback Strategy: Generate Slide
+    filename = f"{index_prefix}_slide.png"
+    target_path = asset_dir / filename
+    logger.info(f"Generating slide for section {i+1}")
+    _create_slide_image(body, heading, target_path)
+    return target_path
+
 def build_assets(script_obj: dict, storage_path: Path, pexels_api_key: str = None) -> List[Path]:
     """
     Builds or downloads visual assets for the script.
@@ -109,49 +234,23 @@ def build_assets(script_obj: dict, storage_path: Path, pexels_api_key: str = Non
         pexels_api_key: API key for Pexels. If None, falls back to generated slides.
         
     Returns:
-        List of Paths to the generated assets.
+        List of Paths to the generated assets, in section order.
     """
     job_id = _get_job_id(script_obj)
     asset_dir = storage_path / "assets" / job_id
     asset_dir.mkdir(parents=True, exist_ok=True)
-    
-    assets = []
+    # Clips are shared across jobs: repeated b-roll queries skip Pexels entirely
+    cache_dir = storage_path / "asset_cache"
+    cache_dir.mkdir(parents=True, exist_ok=True)
     
     sections = script_obj.get("sections", [])
     if not sections:
         logger.warning("No sections found in script object.")
         return []
 
-    for i, section in enumerate(sections):
-        index_prefix = f"{i+1:02d}"
-        heading = section.get("heading", "")
-        body = section.get("body", "")
-        b_roll_query = section.get("b_roll", heading) # Use heading if b_roll empty
-        
-        # Determine strategy
-        asset_path = None
-        
-        if pexels_api_key:
-            logger.info(f"Searching Pexels for: {b_roll_query}")
-            video_url = _search_pexels_video(b_roll_query, pexels_api_key)
-            if video_url:
-                filename = f"{index_prefix}_clip.mp4"
-                target_path = asset_dir / filename
-                try:
-                    _download_file(video_url, target_path)
-                    asset_path = target_path
-                except Exception as e:
-                    logger.error(f"Failed to download video: {e}")
-                    # Fallback to slide if download fails
-        
-        # Fallback Strategy: Generate Slide
-        if not asset_path:
-            filename = f"{index_prefix}_slide.png"
-            target_path = asset_dir / filename
-            logger.info(f"Generating slide for section {i+1}")
-            _create_slide_image(body, heading, target_path)
-            asset_path = target_path
-            
-        assets.append(asset_path)
-        
-    return assets
+    # Wall time is the slowest section rather than the sum; map keeps section order
+    with ThreadPoolExecutor(max_workers=min(MAX_ASSET_WORKERS, len(sections))) as pool:
+        return list(pool.map(
+            lambda item: _build_section_asset(item[0], item[1], asset_dir, cache_dir, pexels_api_key),
+            enumerate(sections),
+        ))
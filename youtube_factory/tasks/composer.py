@@ -1,15 +1,37 @@
-import math
+import io
+import os
 import logging
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 import textwrap
 
-# MoviePy 2.x imports
-from moviepy import VideoFileClip, ImageClip, AudioFileClip, TextClip, concatenate_videoclips, CompositeVideoClip, CompositeAudioClip
-from moviepy.video.fx import Resize, CrossFadeIn
+import numpy as np
+
+from youtube_factory.utils.ffmpeg import run_ffmpeg, probe_duration, available_encoders
 
 logger = logging.getLogger(__name__)
 
+VIDEO_SUFFIXES = {'.mp4', '.mov', '.avi', '.mkv'}
+OUTPUT_SIZE = (1920, 1080)
+CROSSFADE_SECONDS = 0.5
+
+# H.264 encoding dominates a job's CPU time. Set H264_ENCODER to a hardware
+# encoder (h264_nvenc, h264_videotoolbox, h264_qsv) to offload it.
+H264_ENCODER = os.environ.get("H264_ENCODER") or "libx264"
+_ENCODER_ARGS = {
+    "libx264": ["-preset", "veryfast", "-threads", "0"],
+    "h264_nvenc": ["-preset", "p4", "-rc", "vbr", "-cq", "23"],
+    "h264_videotoolbox": ["-b:v", "8M"],
+    "h264_qsv": ["-preset", "veryfast", "-global_quality", "23"],
+}
+
+def _video_encoder_args(encoder: str) -> List[str]:
+    """-c:v plus tuning flags for the encoder, falling back to libx264 if ffmpeg lacks it."""
+    if encoder != "libx264" and encoder not in available_encoders():
+        logger.warning(f"Encoder {encoder} not available in this ffmpeg build, using libx264")
+        encoder = "libx264"
+    return ["-c:v", encoder, *_ENCODER_ARGS.get(encoder, [])]
+
 def _estimate_section_timings(script_obj: Dict, total_audio_duration: float) -> List[float]:
     """
     Estimates the duration of each section based on word count relative to total word count.
@@ -20,61 +42,48 @@ def _estimate_section_timings(script_obj: Dict, total_audio_duration: float) ->
     
     # Calculate word counts
     # A crude approximation: split by space.
-    section_word_counts = []
-    for sec in sections:
-        text = sec.get("body", "") + " " + sec.get("heading", "")
-        count = len(text.split())
-        if count == 0: count = 1 # Avoid zero division or zero duration issues
-        section_word_counts.append(count)
-        
-    total_words = sum(section_word_counts)
-    if total_words == 0:
-        return [total_audio_duration / len(sections)] * len(sections)
-    
-    timings = []
-    current_time = 0.0
-    for count in section_word_counts:
-        duration = (count / total_words) * total_audio_duration
-        timings.append(duration)
-        
-    return timings
+    # Floor at 1 word to avoid zero division or zero duration issues
+    counts = np.fromiter(
+        (max(1, len((sec.get("body", "") + " " + sec.get("heading", "")).split())) for sec in sections),
+        dtype=np.int64,
+        count=len(sections),
+    )
+    # Each section's share of the audio, in one vectorised step
+    return (counts / counts.sum() * total_audio_duration).tolist()
 
 def _format_srt_time(seconds: float) -> str:
     """Formats seconds into SRT time format HH:MM:SS,mmm"""
-    millis = int((seconds - int(seconds)) * 1000)
-    seconds = int(seconds)
-    minutes = seconds // 60
-    hours = minutes // 60
-    minutes %= 60
-    seconds %= 60
-    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{millis:03d}"
+    whole, frac = divmod(seconds, 1)
+    minutes, seconds = divmod(int(whole), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{int(frac * 1000):03d}"
 
 def _generate_srt(script_obj: Dict, timings: List[float], output_path: Path):
     """Generates an SRT file alongside the video."""
     sections = script_obj.get("sections", [])
     srt_path = output_path.with_suffix(".srt")
     
-    with open(srt_path, "w", encoding="utf-8") as f:
-        current_time = 0.0
-        for i, (section, duration) in enumerate(zip(sections, timings)):
-            start_str = _format_srt_time(current_time)
-            end_time = current_time + duration
-            end_str = _format_srt_time(end_time)
-            
-            # Text to display: Heading + Body snippet? Or just body?
-            # For subtitles, usually we want the spoken text.
-            # Since we don't have exact speech-to-text alignment, we'll put the section body.
-            # We might want to wrap it.
-            text = section.get("body", "")
-            # Simple wrapping for SRT
-            wrapped_text = "\n".join(textwrap.wrap(text, width=40))
-            
-            f.write(f"{i+1}\n")
-            f.write(f"{start_str} --> {end_str}\n")
-            f.write(f"{wrapped_text}\n\n")
-            
-            current_time = end_time
-            
+    # Build the whole file in memory and write it with a single call
+    out = io.StringIO()
+    current_time = 0.0
+    for i, (section, duration) in enumerate(zip(sections, timings)):
+        start_str = _format_srt_time(current_time)
+        end_time = current_time + duration
+        end_str = _format_srt_time(end_time)
+        
+        # Text to display: Heading + Body snippet? Or just body?
+        # For subtitles, usually we want the spoken text.
+        # Since we don't have exact speech-to-text alignment, we'll put the section body.
+        # We might want to wrap it.
+        text = section.get("body", "")
+        # Simple wrapping for SRT
+        wrapped_text = "\n".join(textwrap.wrap(text, width=40))
+        
+        out.write(f"{i+1}\n{start_str} --> {end_str}\n{wrapped_text}\n\n")
+        
+        current_time = end_time
+    
+    srt_path.write_text(out.getvalue(), encoding="utf-8")
     return srt_path
 
 def compose_video(
@@ -109,10 +118,9 @@ def compose_video(
         # Ensure parent dir exists
         final_output.parent.mkdir(parents=True, exist_ok=True)
 
-    # Load Audio
+    # Read the voiceover length from its header
     try:
-        audio_clip = AudioFileClip(str(voice_file))
-        total_duration = audio_clip.duration
+        total_duration = probe_duration(voice_file)
     except Exception as e:
         logger.error(f"Failed to load audio: {e}")
         raise e
@@ -125,66 +133,59 @@ def compose_video(
         # logic to handle mismatch if needed, for now assume aligned or slice
         pass
 
-    clips = []
+    # The whole edit runs as one ffmpeg filter graph, so frames never pass
+    # through Python: each asset is an input trimmed to its section length,
+    # scaled to 1080p, faded in (except the first) and concatenated.
+    width, height = OUTPUT_SIZE
+    input_args = []
+    filters = []
     for i, (asset_path, duration) in enumerate(zip(assets, timings)):
         if not asset_path.exists():
             logger.warning(f"Asset missing: {asset_path}, skipping/using placeholder?")
             # Ideally create a black clip or skip
             continue
-            
-        is_video = asset_path.suffix.lower() in ['.mp4', '.mov', '.avi', '.mkv']
         
-        if is_video:
-            clip = VideoFileClip(str(asset_path))
-            # Loop if too short
-            if clip.duration < duration:
-                # Loop
-                n_loops = math.ceil(duration / clip.duration)
-                clip = clip.looped(n_loops)
-                clip = clip.with_duration(duration)
-            else:
-                # Cut
-                clip = clip.with_duration(duration)
+        n = len(filters)
+        if asset_path.suffix.lower() in VIDEO_SUFFIXES:
+            # Loop short clips, cut long ones
+            input_args += ["-stream_loop", "-1", "-t", f"{duration:.3f}", "-i", str(asset_path)]
+            chain = f"[{n}:v]scale={width}:{height},setsar=1,fps={fps},format=yuv420p"
         else:
-            # Image
-            clip = ImageClip(str(asset_path))
-            clip = clip.with_duration(duration)
-            
-        # Standardize resolution (1920x1080)
-        # Using .resized instead of .resize in v2? The import was: from moviepy.video.fx import Resize
-        # Actually in v2 it's typically clip.resized(...) or clip.with_effects([Resize(...)])
-        # Let's check typical usage.
-        # Assuming v2 API: clip.resized(new_size=(1920, 1080)) or similar.
-        # Safest is to use the Resize fx if imported, or the method if available.
-        # moviepy 2.x method is usually `clip.resized(...)`
-        try:
-            # Try method first
-            clip = clip.resized(new_size=(1920, 1080)) 
-        except AttributeError:
-             # Fallback/Older API check (though we installed 2.x)
-             pass
-
-        # Add transition (Crossfade in) except for the first one maybe
-        if i > 0:
-             clip = clip.with_effects([CrossFadeIn(duration=0.5)])
+            # Still image: decode and scale the single frame once, then repeat
+            # the already-converted frame rather than re-decoding and rescaling
+            # a looped input on every output frame
+            input_args += ["-framerate", str(fps), "-i", str(asset_path)]
+            chain = f"[{n}:v]scale={width}:{height},setsar=1,format=yuv420p,loop=loop=-1:size=1,fps={fps}"
+        # Every chain leaves 1080p/yuv420p/fps-aligned, so concat joins them
+        # back to back with no per-frame compositing
+        chain += f",trim=duration={duration:.3f}"
         
-        clips.append(clip)
+        if n > 0:
+            chain += f",fade=t=in:st=0:d={CROSSFADE_SECONDS}"
+        filters.append(chain + f"[v{n}]")
         
-    if not clips:
+    if not filters:
         raise ValueError("No clips could be created.")
-        
-    final_video = concatenate_videoclips(clips, method="compose")
-    final_video = final_video.with_audio(audio_clip)
+    
+    n_clips = len(filters)
+    concat_inputs = "".join(f"[v{n}]" for n in range(n_clips))
+    filter_graph = ";".join(filters) + f";{concat_inputs}concat=n={n_clips}:v=1:a=0[outv]"
     
     # Write file
     logger.info(f"Writing video to {final_output}")
-    final_video.write_videofile(
-        str(final_output), 
-        fps=fps, 
-        codec="libx264", 
-        audio_codec="aac",
-        logger=None # Silent output
-    )
+    run_ffmpeg([
+        *input_args,
+        "-i", str(voice_file),
+        "-filter_complex", filter_graph,
+        "-map", "[outv]",
+        "-map", f"{n_clips}:a",
+        "-r", str(fps),
+        *_video_encoder_args(H264_ENCODER),
+        "-c:a", "aac",
+        # moov atom up front so the upload/preview can start before the file is read fully
+        "-movflags", "+faststart",
+        str(final_output),
+    ])
     
     # Generate SRT
     _generate_srt(script_obj, timings, final_output)
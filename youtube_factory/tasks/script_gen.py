@@ -1,29 +1,269 @@
-import json
+import os
+import asyncio
+import hashlib
 import logging
+import re
+from functools import lru_cache
+from string import Template
+from types import SimpleNamespace
 from typing import Dict, List, Optional, Any
 
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+import orjson
+
+from youtube_factory.utils.retry import RateLimiter, call_with_retry, call_with_retry_async
+
+# Try to import optional dependencies
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    import openai
+except ImportError:
+    openai = None
 
 logger = logging.getLogger(__name__)
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=2, max=10),
-    retry=retry_if_exception_type(Exception),
-    reraise=True
+SCRIPT_MODEL = "gpt-3.5-turbo"
+
+# Shape and rules of one script, shared by the single and batch prompts.
+# The prompts are string.Templates ($name placeholders), so the JSON braces
+# below are literal and substitute() skips format()'s field parsing.
+_SCRIPT_FORMAT = """{
+“title”: “<clickable title under 80 chars>”,
+“hook”: “<10-15s hook that promises a result>”,
+“sections”: [
+{“heading”: “<heading 1>”, “body”: “<paragraph 1 - 40-90 words>”, “b_roll”:””},
+…
+],
+“cta”: “”,
+“tags”:[“tag1”,“tag2”,”…”],
+“shorts”:[ “short clip script 1”, “short clip script 2” ]
+}
+Rules:
+	•	Keep JSON strict, no extra commentary.
+	•	Each “body” must be actionable and include one explicit example.
+	•	Do not produce disallowed content (hate, illegal, sexual, violent). If topic seems disallowed, return:
+{“error”:“content_not_allowed”,“reason”:””}"""
+
+_PROMPT_TEMPLATE = Template("""You are a concise expert content writer for YouTube. Output valid JSON only.
+
+Input:
+	•	topic: $topic
+	•	target_language: $language
+	•	length_seconds: $length_target_seconds
+
+Produce a JSON object:
+""" + _SCRIPT_FORMAT)
+
+_BATCH_PROMPT_TEMPLATE = Template("""You are a concise expert content writer for YouTube. Output valid JSON only.
+
+Write one script for each numbered topic below.
+	•	target_language: $language
+	•	length_seconds: $length_target_seconds
+
+Topics:
+$topic_list
+
+Produce a JSON object {"scripts": [...]} with exactly one entry per topic. Each entry has an "index" field holding the topic's number, plus:
+""" + _SCRIPT_FORMAT)
+
+# Checked with one set comparison against the dict's keys view
+_REQUIRED_KEYS = frozenset({"title", "hook", "sections", "cta", "tags", "shorts"})
+
+class LLMHTTPError(Exception):
+    """Non-2xx reply from the chat completions endpoint."""
+    def __init__(self, status: int, body: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(f"LLM API error: {status} {body}")
+        self.status = status
+        self.headers = headers or {}
+
+class AiohttpLLMClient:
+    """
+    Minimal OpenAI-compatible async client that POSTs straight to the chat
+    completions REST endpoint over one pooled aiohttp session. The SDK's httpx
+    transport stalls past a few dozen concurrent requests; this one doesn't.
+    generate_scripts_async switches to it on its own for large batches.
+
+    Exposes only what the script generator uses:
+    `await client.chat.completions.create(model=..., messages=..., **params)`.
+
+    The session belongs to the running event loop, so open it per loop:
+
+        async with AiohttpLLMClient(api_key) as client:
+            scripts = await generate_scripts_async(topics, llm_client=client, concurrency=100)
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.openai.com/v1",
+        max_connections: int = 200,
+        timeout_seconds: float = 120
+    ):
+        if aiohttp is None:
+            raise ImportError("aiohttp is required for AiohttpLLMClient")
+        self.api_key = api_key
+        self.url = f"{base_url.rstrip('/')}/chat/completions"
+        self.max_connections = max_connections
+        self.timeout_seconds = timeout_seconds
+        self._session = None
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_chat_completion))
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_connections),
+            timeout=aiohttp.ClientTimeout(total=self.timeout_seconds),
+            headers={"Authorization": f"Bearer {self.api_key}"}
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+        self._session = None
+
+    async def _create_chat_completion(self, model: str, messages: List[Dict[str, str]], **params):
+        if self._session is None:
+            raise RuntimeError("AiohttpLLMClient must be used as 'async with AiohttpLLMClient(...)'")
+        async with self._session.post(self.url, json={"model": model, "messages": messages, **params}) as resp:
+            if resp.status >= 400:
+                raise LLMHTTPError(resp.status, await resp.text(), dict(resp.headers))
+            data = await resp.json()
+        # Same attribute shape as the SDK's ChatCompletion for the fields we read
+        return SimpleNamespace(choices=[
+            SimpleNamespace(message=SimpleNamespace(content=choice["message"]["content"]))
+            for choice in data["choices"]
+        ])
+
+# Client-side budget for the OpenAI account; defaults are the gpt-3.5-turbo tier-1 limits
+_LLM_LIMITER = RateLimiter(
+    requests_per_minute=float(os.environ.get("OPENAI_RPM", 3500)),
+    tokens_per_minute=float(os.environ.get("OPENAI_TPM", 200000))
 )
+# Scripts run ~1k tokens of output on top of the prompt
+_REPLY_TOKEN_ESTIMATE = 1024
+
+def _estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    # ~4 characters per token for English prose; only used for throttling
+    return sum(len(m["content"]) for m in messages) // 4 + _REPLY_TOKEN_ESTIMATE
+
 def _call_llm_with_retry(client, model: str, messages: List[Dict[str, str]]) -> str:
-    """Helper to call LLM with retries."""
+    """Helper to call LLM with retries (throttled; honours Retry-After)."""
+    def _call():
+        try:
+            response = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                response_format={"type": "json_object"}
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            logger.error(f"LLM call failed: {e}")
+            raise e
+    return call_with_retry(_call, attempts=3, limiter=_LLM_LIMITER, tokens=_estimate_tokens(messages))
+
+async def _call_llm_with_retry_async(client, model: str, messages: List[Dict[str, str]]) -> str:
+    """Async counterpart of _call_llm_with_retry for an AsyncOpenAI-compatible client."""
+    async def _call():
+        try:
+            response = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                response_format={"type": "json_object"}
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            logger.error(f"LLM call failed: {e}")
+            raise e
+    return await call_with_retry_async(_call, attempts=3, limiter=_LLM_LIMITER, tokens=_estimate_tokens(messages))
+
+def script_cache_key(topic: str, language: str, length_target_seconds: int) -> str:
+    """
+    Cache key for a generated script. Topics are compared case- and
+    whitespace-insensitively, so trivially re-typed topics share an entry.
+    """
+    normalized = " ".join(topic.lower().split())
+    return hashlib.sha256(f"{normalized}|{language}|{length_target_seconds}".encode("utf-8")).hexdigest()
+
+def _build_messages(topic: str, language: str, length_target_seconds: int) -> List[Dict[str, str]]:
+    formatted_prompt = _PROMPT_TEMPLATE.substitute(
+        topic=topic,
+        language=language,
+        length_target_seconds=length_target_seconds
+    )
+    return [
+        {"role": "system", "content": "You are a helpful assistant that outputs JSON."},
+        {"role": "user", "content": formatted_prompt}
+    ]
+
+# The prompt's own examples use curly quotes, and models sometimes echo them
+# back as JSON delimiters
+_QUOTE_TABLE = str.maketrans({"\u201c": '"', "\u201d": '"', "\u2018": "'", "\u2019": "'"})
+# Outermost {...} span: greedy, so it runs from the first "{" to the last "}"
+_JSON_BLOCK = re.compile(r"\{.*\}", re.DOTALL)
+
+@lru_cache(maxsize=1)
+def _json5():
+    """json5 module if installed; imported on first use since only broken replies need it."""
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            response_format={"type": "json_object"}
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        logger.error(f"LLM call failed: {e}")
-        raise e
+        import json5
+    except ImportError:
+        return None
+    return json5
+
+def _decode_json(content: str) -> Any:
+    """
+    Decodes an LLM JSON reply, cheapest parser first. Well-formed replies cost
+    a single orjson call; only broken ones pay for the fallbacks:
+    the outermost {...} span (drops prose or code fences around it), the same
+    with curly quotes straightened, then json5 (trailing commas, single
+    quotes; orders of magnitude slower, optional dependency).
+    Raises ValueError("invalid_response") if nothing parses.
+    """
+    if not isinstance(content, (str, bytes)) or not content:
+        raise ValueError("invalid_response")
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        pass
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", errors="replace")
+
+    match = _JSON_BLOCK.search(content)
+    span = match.group(0) if match else content
+    candidates = (span, span.translate(_QUOTE_TABLE))
+    for candidate in candidates:
+        try:
+            return orjson.loads(candidate)
+        except orjson.JSONDecodeError:
+            pass
+    json5 = _json5()
+    if json5 is not None:
+        for candidate in candidates:
+            try:
+                return json5.loads(candidate)
+            except ValueError:
+                pass
+    raise ValueError("invalid_response")
+
+def _validate_script_obj(data: Any) -> Dict[str, Any]:
+    """Checks one decoded script object. Raises ValueError like generate_script."""
+    if not isinstance(data, dict):
+        raise ValueError("invalid_response")
+
+    if "error" in data and data["error"] == "content_not_allowed":
+        reason = data.get("reason", "Unknown reason")
+        raise ValueError("content_not_allowed", reason)
+
+    if not _REQUIRED_KEYS <= data.keys() or not isinstance(data["sections"], list):
+        raise ValueError("invalid_response")
+
+    return data
+
+def _parse_script(content: str) -> Dict[str, Any]:
+    """Decodes and validates the LLM's JSON reply. Raises ValueError like generate_script."""
+    return _validate_script_obj(_decode_json(content))
 
 def generate_script(
     topic: str,
@@ -55,63 +295,127 @@ def generate_script(
     if llm_client is None:
         raise ValueError("llm_client is required")
 
-    prompt_template = """You are a concise expert content writer for YouTube. Output valid JSON only.
+    messages = _build_messages(topic, language, length_target_seconds)
 
-Input:
-	•	topic: {topic}
-	•	target_language: {language}
-	•	length_seconds: {length_target_seconds}
+    try:
+        content = _call_llm_with_retry(llm_client, SCRIPT_MODEL, messages)
+    except Exception as e:
+        raise ValueError(f"Failed to get response from LLM: {e}")
 
-Produce a JSON object:
-{{
-“title”: “<clickable title under 80 chars>”,
-“hook”: “<10-15s hook that promises a result>”,
-“sections”: [
-{{“heading”: “<heading 1>”, “body”: “<paragraph 1 - 40-90 words>”, “b_roll”:””}},
-…
-],
-“cta”: “”,
-“tags”:[“tag1”,“tag2”,”…”],
-“shorts”:[ “short clip script 1”, “short clip script 2” ]
-}}
-Rules:
-	•	Keep JSON strict, no extra commentary.
-	•	Each “body” must be actionable and include one explicit example.
-	•	Do not produce disallowed content (hate, illegal, sexual, violent). If topic seems disallowed, return:
-{{“error”:“content_not_allowed”,“reason”:””}}"""
+    return _parse_script(content)
 
-    formatted_prompt = prompt_template.format(
-        topic=topic,
-        language=language,
-        length_target_seconds=length_target_seconds
-    )
+async def generate_script_async(
+    topic: str,
+    language: str = "en",
+    length_target_seconds: int = 480,
+    llm_client: Any = None
+) -> Dict[str, Any]:
+    """
+    Async variant of generate_script; llm_client must be an AsyncOpenAI-compatible
+    client. Same return value and errors.
+    """
+    if llm_client is None:
+        raise ValueError("llm_client is required")
 
-    messages = [
-        {"role": "system", "content": "You are a helpful assistant that outputs JSON."},
-        {"role": "user", "content": formatted_prompt}
-    ]
+    messages = _build_messages(topic, language, length_target_seconds)
 
     try:
-        content = _call_llm_with_retry(llm_client, "gpt-3.5-turbo", messages)
+        content = await _call_llm_with_retry_async(llm_client, SCRIPT_MODEL, messages)
     except Exception as e:
         raise ValueError(f"Failed to get response from LLM: {e}")
 
-    try:
-        data = json.loads(content)
-    except json.JSONDecodeError as e:
-        raise ValueError("invalid_response") from e
+    return _parse_script(content)
 
-    if "error" in data and data["error"] == "content_not_allowed":
-        reason = data.get("reason", "Unknown reason")
-        raise ValueError("content_not_allowed", reason)
+# From this many requests in flight, an SDK AsyncOpenAI client is swapped for
+# AiohttpLLMClient (same key and base URL) for the batch
+AIOHTTP_MIN_CONCURRENCY = int(os.environ.get("AIOHTTP_MIN_CONCURRENCY", 32))
 
-    required_keys = ["title", "hook", "sections", "cta", "tags", "shorts"]
-    missing_keys = [k for k in required_keys if k not in data]
-    
-    if missing_keys:
-        raise ValueError("invalid_response")
+def _aiohttp_client_for(llm_client: Any, concurrency: int) -> Optional["AiohttpLLMClient"]:
+    if aiohttp is None or openai is None or concurrency < AIOHTTP_MIN_CONCURRENCY:
+        return None
+    if not isinstance(llm_client, openai.AsyncOpenAI):
+        return None
+    return AiohttpLLMClient(llm_client.api_key, str(llm_client.base_url), max_connections=concurrency)
 
-    if not isinstance(data.get("sections"), list):
-        raise ValueError("invalid_response")
+async def generate_scripts_async(
+    topics: List[str],
+    language: str = "en",
+    length_target_seconds: int = 480,
+    llm_client: Any = None,
+    concurrency: int = 8
+) -> List[Any]:
+    """
+    Generates scripts for many topics with up to `concurrency` LLM requests in
+    flight. Results are in topic order; a topic that fails yields its
+    exception instead of cancelling the rest of the batch. At
+    AIOHTTP_MIN_CONCURRENCY or more, an AsyncOpenAI client's requests go
+    through AiohttpLLMClient instead.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
 
-    return data
+    async def _run(client):
+        async def _one(topic: str):
+            async with semaphore:
+                return await generate_script_async(topic, language, length_target_seconds, client)
+
+        return await asyncio.gather(*(_one(t) for t in topics), return_exceptions=True)
+
+    direct = _aiohttp_client_for(llm_client, concurrency)
+    if direct is None:
+        return await _run(llm_client)
+    # Session opened on the running loop and closed with the batch
+    async with direct:
+        return await _run(direct)
+
+def generate_scripts_batch(
+    topics: List[str],
+    language: str = "en",
+    length_target_seconds: int = 480,
+    llm_client: Any = None,
+    batch_size: int = 5
+) -> List[Any]:
+    """
+    Generates scripts for several topics, packing up to `batch_size` topics
+    into each LLM request. This cuts request count (and RPM pressure) for
+    daily topic lists at the same token budget.
+
+    Returns one entry per topic, in order: the script dict, or the ValueError
+    that topic's entry failed with ("invalid_response", "content_not_allowed").
+    """
+    if llm_client is None:
+        raise ValueError("llm_client is required")
+
+    results: List[Any] = []
+    for start in range(0, len(topics), batch_size):
+        chunk = topics[start:start + batch_size]
+        prompt = _BATCH_PROMPT_TEMPLATE.substitute(
+            topic_list="\n".join(f"{i}. {t}" for i, t in enumerate(chunk, 1)),
+            language=language,
+            length_target_seconds=length_target_seconds
+        )
+        messages = [
+            {"role": "system", "content": "You are a helpful assistant that outputs JSON."},
+            {"role": "user", "content": prompt}
+        ]
+
+        try:
+            content = _call_llm_with_retry(llm_client, SCRIPT_MODEL, messages)
+            entries = _decode_json(content).get("scripts")
+        except Exception as e:
+            results.extend(ValueError("invalid_response", str(e)) for _ in chunk)
+            continue
+
+        # Dispatch entries back to their topics by the index the model echoed
+        by_index = {}
+        if isinstance(entries, list):
+            for entry in entries:
+                if isinstance(entry, dict) and isinstance(entry.get("index"), int):
+                    by_index[entry.pop("index")] = entry
+
+        for i in range(1, len(chunk) + 1):
+            try:
+                results.append(_validate_script_obj(by_index.get(i)))
+            except ValueError as e:
+                results.append(e)
+
+    return results
@@ -1,8 +1,12 @@
 import os
 import logging
 import uuid
+from io import BytesIO
 import textwrap
 import requests
+from concurrent.futures import ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, Optional, Tuple
 
@@ -21,11 +25,21 @@ def _get_job_id(script_obj: Dict) -> str:
     slug = "".join(c if c.isalnum() else "_" for c in title)[:20]
     return f"{slug}_{uuid.uuid4().hex[:8]}"
 
+# Pooled keep-alive session: back-to-back thumbnail downloads from the
+# image CDN reuse one TCP/TLS connection instead of a handshake each.
+_SESSION = requests.Session()
+_adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10)
+_SESSION.mount("https://", _adapter)
+_SESSION.mount("http://", _adapter)
+
+# Images are 1-2 MB; 64 KiB reads keep the syscall count low
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
 def _download_image(url: str, dest_path: Path):
-    with requests.get(url, stream=True) as r:
+    with _SESSION.get(url, stream=True) as r:
         r.raise_for_status()
         with open(dest_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
+            for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
                 f.write(chunk)
 
 def _generate_with_dalle(prompt: str, api_key: str, dest_path: Path):
@@ -47,60 +61,121 @@ def _generate_with_dalle(prompt: str, api_key: str, dest_path: Path):
         logger.error(f"DALL-E generation failed: {e}")
         raise e
 
+# Try common macOS font since we detected it, fallback to default (which won't scale well but prevents crash)
+FONT_PATHS = [
+    "/System/Library/Fonts/Helvetica.ttc",
+    "/Library/Fonts/Arial.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf" # Linux common
+]
+# Resolved once at import instead of stat-ing every candidate per call
+_FONT_PATH = next((p for p in FONT_PATHS if os.path.exists(p)), None)
+
+@lru_cache(maxsize=1)
+def _base_font() -> Optional[ImageFont.FreeTypeFont]:
+    """
+    The face at _FONT_PATH, read once; None if no usable font exists.
+    Loaded from bytes so font_variant() reuses them (a path-loaded face
+    makes every variant re-open and re-parse the file).
+    """
+    if _FONT_PATH is None:
+        return None
+    try:
+        return ImageFont.truetype(BytesIO(Path(_FONT_PATH).read_bytes()), 100)
+    except Exception:
+        return None
+
+@lru_cache(maxsize=64)
 def _get_font(size: int) -> ImageFont.FreeTypeFont:
-    # Try common macOS font since we detected it, fallback to default (which won't scale well but prevents crash)
-    font_paths = [
-        "/System/Library/Fonts/Helvetica.ttc",
-        "/Library/Fonts/Arial.ttf",
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf" # Linux common
-    ]
-    for p in font_paths:
-        if os.path.exists(p):
-            try:
-                return ImageFont.truetype(p, size)
-            except Exception:
-                continue
-    return ImageFont.load_default()
-
-def _fit_text(draw: ImageDraw.ImageDraw, text: str, max_width: int, max_height: int, start_size: int = 100) -> Tuple[ImageFont.ImageFont, list]:
+    base = _base_font()
+    if base is None:
+        return ImageFont.load_default()
+    # New size from the base face's in-memory bytes; no file access
+    return base.font_variant(size=size)
+
+def _wrap_to_width(text: str, font: ImageFont.ImageFont, max_width: int) -> Optional[list]:
+    """
+    Greedy word wrap by measured advance width (font.getlength uses the
+    kerning tables, no rasterizing). Returns None if a single word is wider
+    than max_width.
+    """
+    space = font.getlength(" ")
+    lines, current, current_w = [], [], 0.0
+    for word in text.split():
+        word_w = font.getlength(word)
+        if word_w > max_width:
+            return None
+        if current and current_w + space + word_w > max_width:
+            lines.append(" ".join(current))
+            current, current_w = [word], word_w
+        else:
+            current_w = current_w + space + word_w if current else word_w
+            current.append(word)
+    if current:
+        lines.append(" ".join(current))
+    return lines
+
+def _block_height(font: ImageFont.ImageFont, lines: list, spacing: int = 4) -> int:
+    # Same line pitch multiline_text uses: height of "A" plus spacing
+    if not lines:
+        return 0
+    line_pitch = font.getbbox("A")[3] + spacing
+    return (len(lines) - 1) * line_pitch + font.getbbox(lines[-1])[3] - font.getbbox(lines[0])[1]
+
+def _fit_text(draw: ImageDraw.ImageDraw, text: str, max_width: int, max_height: int, start_size: int = 100) -> Tuple[ImageFont.ImageFont, str, Tuple[int, int, int, int]]:
     """
     Finds a font size and wrapped lines that fit within max_width and max_height.
+    Returns the font, the lines joined for multiline_text, and their bbox at (0, 0).
+    Sizes step down from start_size in 5pt increments. Wrapping is by measured
+    width, so a smaller size never needs more room and the largest fitting
+    size can be found by binary search.
     """
-    size = start_size
     min_size = 20
+    steps = (start_size - min_size) // 5
+
+    def layout(k: int) -> Optional[list]:
+        font = _get_font(start_size - 5 * k)
+        lines = _wrap_to_width(text, font, max_width)
+        if lines is None or _block_height(font, lines) > max_height:
+            return None
+        return lines
+
+    # Smallest k (largest size start_size - 5k) whose layout fits
+    lo, hi = 0, steps + 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if layout(mid) is not None:
+            hi = mid
+        else:
+            lo = mid + 1
+
+    if lo > steps:
+        font, lines = _get_font(min_size), textwrap.wrap(text, width=20) # Fallback
+    else:
+        font, lines = _get_font(start_size - 5 * lo), layout(lo)
+    # Exact layout is measured once, for the chosen size only
+    text_block = "\n".join(lines)
+    return font, text_block, draw.multiline_textbbox((0, 0), text_block, font=font)
+
+@lru_cache(maxsize=8)
+def _badge_sprite(badge_size: int, fill: Tuple[int, int, int], badge_text: str) -> Image.Image:
+    """
+    The corner badge is identical on every thumbnail, so it is drawn once per
+    process as an RGBA sprite and pasted with its own alpha as the mask.
+    """
+    # Ellipse bounds are inclusive, so the circle spans badge_size + 1 pixels
+    sprite = Image.new("RGBA", (badge_size + 1, badge_size + 1), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(sprite)
+    draw.ellipse([0, 0, badge_size, badge_size], fill=fill)
     
-    while size >= min_size:
-        font = _get_font(size)
-        # Wrap text based on approximate char width? 
-        # Pillow doesn't have native multiline wrap based on pixels easily without iteration.
-        # We'll try to wrap based on an estimated average char width.
-        # Heuristic: Average char width ~ 0.5 * size (very rough)
-        # max_chars_per_line ~ max_width / (0.5 * size)
-        avg_char_width = size * 0.5
-        chars_per_line = max(1, int(max_width / avg_char_width))
-        
-        wrapper = textwrap.TextWrapper(width=chars_per_line)
-        lines = wrapper.wrap(text)
-        
-        # Calculate actual size
-        # ImageDraw.textbbox or textsize (deprecated)
-        # We'll use multiline_textbbox if available (Pillow 8+)
-        try:
-            left, top, right, bottom = draw.multiline_textbbox((0, 0), "\n".join(lines), font=font)
-            w = right - left
-            h = bottom - top
-        except AttributeError:
-            # Fallback for older Pillow
-            w, h = draw.multiline_textsize("\n".join(lines), font=font)
-            
-        if w <= max_width and h <= max_height:
-            return font, lines
-        
-        size -= 5
-        
-    return _get_font(min_size), textwrap.wrap(text, width=20) # Fallback
+    font_badge = _get_font(40)
+    lb, tb, rb, bb = draw.textbbox((0,0), badge_text, font=font_badge)
+    bw, bh = rb - lb, bb - tb
+    bx = (badge_size - bw) / 2
+    by = (badge_size - bh) / 2
+    draw.text((bx, by - 5), badge_text, font=font_badge, fill=(255, 255, 255))
+    return sprite
 
-def _generate_with_pillow(title: str, hook: str, dest_path: Path):
+def _render_pillow(title: str, hook: str) -> Image.Image:
     width, height = 1280, 720
     # High contrast background: Bright Yellow or Red or Deep Blue?
     # Let's go with Deep Blue background, White text, Yellow accent.
@@ -117,13 +192,10 @@ def _generate_with_pillow(title: str, hook: str, dest_path: Path):
     max_w = width - 2 * margin
     max_h = height * 0.6
     
-    font_headline, lines_headline = _fit_text(draw, headline.upper(), max_w, max_h, start_size=150)
+    font_headline, text_headline, (left, top, right, bottom) = _fit_text(draw, headline.upper(), max_w, max_h, start_size=150)
     
     # Draw Headline
-    text_headline = "\n".join(lines_headline)
     # Center vertically in top portion?
-    # Get bbox
-    left, top, right, bottom = draw.multiline_textbbox((0, 0), text_headline, font=font_headline)
     h_text = bottom - top
     y_headline = margin + (max_h - h_text) / 2
     
@@ -134,25 +206,26 @@ def _generate_with_pillow(title: str, hook: str, dest_path: Path):
     max_h_sub = height * 0.2
     y_sub = margin + max_h + 20
     
-    font_sub, lines_sub = _fit_text(draw, subtitle, max_w, max_h_sub, start_size=60)
-    draw.multiline_text((margin, y_sub), "\n".join(lines_sub), font=font_sub, fill=(200, 200, 200), align="left")
+    font_sub, text_sub, _ = _fit_text(draw, subtitle, max_w, max_h_sub, start_size=60)
+    draw.multiline_text((margin, y_sub), text_sub, font=font_sub, fill=(200, 200, 200), align="left")
     
     # 3. Brand Corner Badge
     # A circle or rect in bottom right
     badge_size = 150
-    badge_rect = [width - badge_size - margin, height - badge_size - margin, width - margin, height - margin]
-    draw.ellipse(badge_rect, fill=(255, 0, 0)) # Red badge
-    
-    # "NEW" text in badge
-    badge_text = "NEW"
-    font_badge = _get_font(40)
-    lb, tb, rb, bb = draw.textbbox((0,0), badge_text, font=font_badge)
-    bw, bh = rb - lb, bb - tb
-    bx = badge_rect[0] + (badge_size - bw) / 2
-    by = badge_rect[1] + (badge_size - bh) / 2
-    draw.text((bx, by - 5), badge_text, font=font_badge, fill=(255, 255, 255))
+    badge = _badge_sprite(badge_size, (255, 0, 0), "NEW") # Red badge
+    img.paste(badge, (width - badge_size - margin, height - badge_size - margin), badge)
+
+    return img
+
+def _generate_with_pillow(title: str, hook: str, dest_path: Path):
+    _render_pillow(title, hook).save(dest_path)
 
-    img.save(dest_path)
+# How long to wait for DALL-E before shipping the Pillow thumbnail instead
+AI_THUMBNAIL_DEADLINE = float(os.environ.get("AI_THUMBNAIL_DEADLINE_SECONDS", "45"))
+
+# Shared by all jobs in the process; not a context manager, so a late
+# DALL-E call never blocks generate_thumbnail from returning
+_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="thumbnail")
 
 def generate_thumbnail(script_obj: Dict, storage_path: Path, ai_image_api_key: str = None) -> Path:
     """
@@ -176,20 +249,33 @@ def generate_thumbnail(script_obj: Dict, storage_path: Path, ai_image_api_key: s
     title = script_obj.get("title", "Video Title")
     hook = script_obj.get("hook", "Watch this video!")
     
-    generated_by_ai = False
-    if ai_image_api_key:
-        try:
-            logger.info("Generating thumbnail with AI...")
-            # Create a prompt
-            prompt = f"YouTube thumbnail for video titled '{title}'. Concept: {hook}. High contrast, catchy, 4k resolution."
-            _generate_with_dalle(prompt, ai_image_api_key, output_path)
-            generated_by_ai = True
-        except Exception as e:
-            logger.warning(f"AI generation failed, falling back to Pillow: {e}")
-            generated_by_ai = False
-            
-    if not generated_by_ai:
+    if not ai_image_api_key:
         logger.info("Generating thumbnail with Pillow...")
         _generate_with_pillow(title, hook, output_path)
-        
+        return output_path
+
+    # Render the Pillow fallback while DALL-E runs, so a slow or failed AI
+    # request never adds its latency on top of the fallback.
+    # Both land in side files and only the chosen one is moved into place;
+    # the other is deleted when it finishes.
+    logger.info("Generating thumbnail with AI (Pillow fallback in parallel)...")
+    prompt = f"YouTube thumbnail for video titled '{title}'. Concept: {hook}. High contrast, catchy, 4k resolution."
+    ai_path = output_path.with_name(f".ai.{output_path.name}")
+    pillow_path = output_path.with_name(f".pillow.{output_path.name}")
+    ai_future = _EXECUTOR.submit(_generate_with_dalle, prompt, ai_image_api_key, ai_path)
+    pillow_future = _EXECUTOR.submit(_generate_with_pillow, title, hook, pillow_path)
+
+    done, _ = wait([ai_future], timeout=AI_THUMBNAIL_DEADLINE)
+    if ai_future in done and ai_future.exception() is None:
+        os.replace(ai_path, output_path)
+        pillow_future.add_done_callback(lambda _: pillow_path.unlink(missing_ok=True))
+        return output_path
+
+    if ai_future in done:
+        logger.warning(f"AI generation failed, falling back to Pillow: {ai_future.exception()}")
+    else:
+        logger.warning(f"AI generation exceeded {AI_THUMBNAIL_DEADLINE:.0f}s, falling back to Pillow")
+    ai_future.add_done_callback(lambda _: ai_path.unlink(missing_ok=True))
+    pillow_future.result()
+    os.replace(pillow_path, output_path)
     return output_path
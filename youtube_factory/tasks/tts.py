@@ -1,20 +1,28 @@
+import io
 import os
 import time
 import logging
-import uuid
 from pathlib import Path
-from typing import Optional, Any, Union
+from typing import List, Optional, Any, Union
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import re
+import string
+import unicodedata
 from datetime import datetime
 
 import requests
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+
+from youtube_factory.utils.ffmpeg import run_ffmpeg
+from youtube_factory.utils.retry import call_with_retry
 
 # Try to import optional dependencies
 try:
     import boto3
+    from botocore.config import Config as BotoConfig
 except ImportError:
     boto3 = None
+    BotoConfig = None
 
 try:
     from pydub import AudioSegment
@@ -23,22 +31,32 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Every ASCII char that isn't [a-z0-9] becomes a separator
+_SLUG_TABLE = str.maketrans({
+    c: " " for c in map(chr, range(128)) if c not in string.ascii_lowercase + string.digits
+})
+
 def _slugify(text: str) -> str:
     """Simple slugify implementation."""
-    text = text.lower()
-    text = re.sub(r'[^a-z0-9]+', '-', text)
-    return text.strip('-')
+    # Fold accents to ASCII ("café" -> "cafe") and drop anything else non-ASCII
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    # split() collapses separator runs and trims the ends in one C pass
+    return "-".join(text.lower().translate(_SLUG_TABLE).split())
 
 class TTSError(Exception):
-    pass
-
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=2, max=10),
-    retry=retry_if_exception_type((requests.RequestException, TTSError)),
-    reraise=True
-)
+    def __init__(self, message: str, headers: Any = None):
+        super().__init__(message)
+        # Response headers, so the retry loop can honour Retry-After on 429s
+        self.headers = headers
+
 def _call_elevenlabs(text: str, voice_id: str, api_key: str, http_client: Any) -> bytes:
+    return call_with_retry(
+        lambda: _call_elevenlabs_once(text, voice_id, api_key, http_client),
+        attempts=3,
+        retry_on=(requests.RequestException, TTSError)
+    )
+
+def _call_elevenlabs_once(text: str, voice_id: str, api_key: str, http_client: Any) -> bytes:
     url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
     headers = {
         "xi-api-key": api_key,
@@ -60,15 +78,27 @@ def _call_elevenlabs(text: str, voice_id: str, api_key: str, http_client: Any) -
         response = requests.post(url, json=data, headers=headers)
         
     if response.status_code != 200:
-        raise TTSError(f"ElevenLabs API error: {response.status_code} {response.text}")
+        raise TTSError(f"ElevenLabs API error: {response.status_code} {response.text}", getattr(response, "headers", None))
     
     return response.content
 
+@lru_cache(maxsize=1)
+def _polly_client() -> Any:
+    """
+    One Polly client per process: credential discovery, endpoint resolution
+    and the TLS pool are set up once. Sized for MAX_TTS_WORKERS parallel
+    chunks across concurrent jobs; botocore's adaptive retry handles throttling.
+    """
+    return boto3.client(
+        "polly",
+        config=BotoConfig(max_pool_connections=25, retries={"max_attempts": 3, "mode": "adaptive"})
+    )
+
 def _call_polly(text: str, voice_id: str) -> bytes:
     if boto3 is None:
         raise ImportError("boto3 is required for Amazon Polly fallback")
     
-    client = boto3.client("polly")
+    client = _polly_client()
     try:
         response = client.synthesize_speech(
             Text=text,
@@ -82,6 +112,98 @@ def _call_polly(text: str, voice_id: str) -> bytes:
         return response["AudioStream"].read()
     raise TTSError("Polly did not return audio stream")
 
+# ElevenLabs accepts 5000 characters per request; stay under it with margin
+MAX_CHUNK_CHARS = 4800
+# Chunks are independent requests, so they are synthesized concurrently
+MAX_TTS_WORKERS = 4
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+def _split_text(text: str, limit: int = MAX_CHUNK_CHARS) -> List[str]:
+    """
+    Splits text into request-sized chunks at sentence boundaries, greedily
+    packing sentences up to `limit` characters. A single sentence longer than
+    the limit is cut at the last space before it.
+    """
+    if len(text) <= limit:
+        return [text]
+
+    chunks = []
+    current = ""
+    for sentence in _SENTENCE_END.split(text):
+        while len(sentence) > limit:
+            cut = sentence.rfind(" ", 0, limit)
+            if cut <= 0:
+                cut = limit
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if current and len(current) + 1 + len(sentence) > limit:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _synthesize_chunk(chunk: str, voice_profile: str, eleven_key: Optional[str], polly_creds_present: Any, http_client: Any) -> bytes:
+    """MP3 bytes for one chunk: ElevenLabs first, Polly as fallback."""
+    audio_data = None
+    
+    # 1. Try ElevenLabs
+    if eleven_key:
+        try:
+            # Map "alloy" to a default ElevenLabs voice if needed, or use as is
+            # For now we use voice_profile as the ID. 
+            # If "alloy" is passed, it might fail on ElevenLabs if not mapped.
+            # We'll assume the user passes a valid ID or we use a fallback ID for "alloy"
+            effective_voice = "21m00Tcm4TlvDq8ikWAM" if voice_profile == "alloy" else voice_profile # Rachel default
+            audio_data = _call_elevenlabs(chunk, effective_voice, eleven_key, http_client)
+        except Exception as e:
+            logger.warning(f"ElevenLabs failed: {e}. Trying fallback.")
+            
+    # 2. Fallback to Polly
+    if audio_data is None and polly_creds_present:
+        try:
+            # Map "alloy" to a default Polly voice
+            effective_voice = "Joanna" if voice_profile == "alloy" else voice_profile
+            audio_data = _call_polly(chunk, effective_voice)
+        except Exception as e:
+            logger.warning(f"Polly failed: {e}")
+
+    if audio_data is None:
+         raise EnvironmentError("TTS generation failed. Check credentials for ElevenLabs or AWS Polly.")
+    return audio_data
+
+def _concat_mp3(audio_chunks: List[bytes], output_path: Path) -> None:
+    """
+    Joins MP3 chunks by piping them, back to back, into ffmpeg and stream
+    copying; every chunk comes from the same voice and bitrate, so nothing
+    needs re-encoding and nothing touches disk but the output. MP3 is a plain
+    frame sequence, so the mp3 demuxer reads the joined bytes as one stream.
+    Falls back to a pydub decode/re-encode if ffmpeg rejects the input,
+    and to raw byte concatenation if pydub is missing too.
+    """
+    try:
+        run_ffmpeg(["-f", "mp3", "-i", "pipe:0", "-c", "copy", str(output_path)], input=b"".join(audio_chunks))
+        return
+    except (RuntimeError, OSError) as e:
+        logger.warning(f"ffmpeg concat failed ({e}); falling back to re-encode.")
+
+    if AudioSegment:
+        final_audio = sum(
+            (AudioSegment.from_file(io.BytesIO(data), format="mp3") for data in audio_chunks[1:]),
+            AudioSegment.from_file(io.BytesIO(audio_chunks[0]), format="mp3"),
+        )
+        final_audio.export(str(output_path), format="mp3")
+    else:
+        # Byte concatenation fallback (works for some MP3s, risky)
+        with open(output_path, "wb") as f:
+            for data in audio_chunks:
+                f.write(data)
+
 def tts_from_text(
     text: str, 
     voice_profile: str = "alloy", 
@@ -114,70 +236,18 @@ def tts_from_text(
     filename = f"{slug}_{timestamp}.mp3"
     output_path = storage_path / filename
 
-    # Chunking logic for long text
-    chunks = []
-    if len(text) > 5000:
-        # Simple split by length, ideally split by sentences
-        for i in range(0, len(text), 5000):
-            chunks.append(text[i:i+5000])
+    # Sentence-aligned chunks, synthesized concurrently; pool.map keeps order
+    chunks = _split_text(text)
+    synthesize = lambda chunk: _synthesize_chunk(chunk, voice_profile, eleven_key, polly_creds_present, llm_client)
+    if len(chunks) == 1:
+        audio_chunks = [synthesize(chunks[0])]
     else:
-        chunks.append(text)
+        with ThreadPoolExecutor(max_workers=min(MAX_TTS_WORKERS, len(chunks))) as pool:
+            audio_chunks = list(pool.map(synthesize, chunks))
 
-    audio_segments = []
-
-    for i, chunk in enumerate(chunks):
-        audio_data = None
-        
-        # 1. Try ElevenLabs
-        if eleven_key:
-            try:
-                # Map "alloy" to a default ElevenLabs voice if needed, or use as is
-                # For now we use voice_profile as the ID. 
-                # If "alloy" is passed, it might fail on ElevenLabs if not mapped.
-                # We'll assume the user passes a valid ID or we use a fallback ID for "alloy"
-                effective_voice = "21m00Tcm4TlvDq8ikWAM" if voice_profile == "alloy" else voice_profile # Rachel default
-                audio_data = _call_elevenlabs(chunk, effective_voice, eleven_key, llm_client)
-            except Exception as e:
-                logger.warning(f"ElevenLabs failed: {e}. Trying fallback.")
-                
-        # 2. Fallback to Polly
-        if audio_data is None and polly_creds_present:
-            try:
-                # Map "alloy" to a default Polly voice
-                effective_voice = "Joanna" if voice_profile == "alloy" else voice_profile
-                audio_data = _call_polly(chunk, effective_voice)
-            except Exception as e:
-                logger.warning(f"Polly failed: {e}")
-
-        if audio_data is None:
-             raise EnvironmentError("TTS generation failed. Check credentials for ElevenLabs or AWS Polly.")
-
-        # Save chunk to temp file to load with pydub (or append bytes directly if supported)
-        chunk_path = storage_path / f"chunk_{uuid.uuid4()}.mp3"
-        with open(chunk_path, "wb") as f:
-            f.write(audio_data)
-        
-        if AudioSegment:
-            segment = AudioSegment.from_mp3(str(chunk_path))
-            audio_segments.append(segment)
-            # cleanup chunk
-            chunk_path.unlink()
-        else:
-            # If pydub missing, we can only support 1 chunk or simple concatenation if formats allow
-            # MP3s can often be concatenated by bytes.
-            audio_segments.append(audio_data) # Store bytes
-            chunk_path.unlink()
-
-    # Combine and save
-    if AudioSegment and isinstance(audio_segments[0], AudioSegment):
-        final_audio = audio_segments[0]
-        for seg in audio_segments[1:]:
-            final_audio += seg
-        final_audio.export(str(output_path), format="mp3")
+    if len(audio_chunks) == 1:
+        output_path.write_bytes(audio_chunks[0])
     else:
-        # Byte concatenation fallback (works for some MP3s, risky)
-        with open(output_path, "wb") as f:
-            for seg in audio_segments:
-                f.write(seg)
-                
+        _concat_mp3(audio_chunks, output_path)
+
     return output_path
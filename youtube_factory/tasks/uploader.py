@@ -1,15 +1,21 @@
+import mmap
 import os
-import json
 import logging
+import threading
+import time
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 
+import orjson
 import requests
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type, before_sleep_log
+from requests.adapters import HTTPAdapter
+from tenacity import retry, stop_after_attempt, wait_exponential_jitter, retry_if_exception_type, before_sleep_log
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
-from youtube_factory.models import Base, PendingUpload
+from youtube_factory.models import PendingUpload, JSON_ENGINE_KWARGS
+from youtube_factory.utils.retry import backoff_delay
 
 logger = logging.getLogger(__name__)
 
@@ -18,20 +24,62 @@ TOKEN_URI = "https://oauth2.googleapis.com/token"
 UPLOAD_URL = "https://www.googleapis.com/upload/youtube/v3/videos"
 THUMBNAIL_URL = "https://www.googleapis.com/upload/youtube/v3/thumbnails/set"
 
+# (connect, read) seconds; without one a stalled socket hangs the RQ job
+# until its 1h job_timeout instead of failing into the retry policy
+HTTP_TIMEOUT = (10, 120)
+
+# Resumable upload chunk size; the API requires a multiple of 256 KiB
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+# Consecutive failures tolerated on one chunk before the whole upload is retried
+UPLOAD_CHUNK_ATTEMPTS = 5
+
+# One keep-alive pool for token exchange, upload init, byte PUT and thumbnail
+# POST, so only the first call per host pays for the TCP/TLS handshake. RQ
+# workers are long-lived, so it persists across jobs; built on first use.
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+
+def _get_session() -> requests.Session:
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                session = requests.Session()
+                # Retries are handled by tenacity around each call
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _SESSION = session
+    return _SESSION
+
 class UploadError(Exception):
     pass
 
 class RetriableError(UploadError):
     pass
 
-def _get_db_session():
-    """Creates a DB session. Defaults to sqlite if DATABASE_URL not set."""
+class RateLimitError(RetriableError):
+    """HTTP 429. Retried like a 5xx; the daily quota (403) is not."""
+    pass
+
+# Transient failures worth another attempt: 5xx/429 responses and network errors
+_RETRYABLE = retry_if_exception_type((RetriableError, requests.ConnectionError, requests.Timeout))
+
+@lru_cache(maxsize=1)
+def _session_factory() -> sessionmaker:
+    """
+    Engine (and its connection pool) and sessionmaker, built once per process
+    on first use instead of per pending upload. Defaults to sqlite if
+    DATABASE_URL not set. The schema is created at startup (models.init_db),
+    not here.
+    """
     db_url = os.environ.get("DATABASE_URL", "sqlite:///./youtube_factory.db")
-    engine = create_engine(db_url)
-    # Ensure tables exist (safe to call multiple times)
-    Base.metadata.create_all(engine)
-    Session = sessionmaker(bind=engine)
-    return Session()
+    engine = create_engine(db_url, pool_pre_ping=True, **JSON_ENGINE_KWARGS)
+    return sessionmaker(bind=engine)
+
+def _get_db_session():
+    """Creates a DB session from the cached factory."""
+    return _session_factory()()
 
 def _save_pending_upload(video_path: Path, thumbnail_path: Path, title: str, desc: str, tags: List[str]) -> int:
     """Persists upload metadata to DB."""
@@ -42,7 +90,7 @@ def _save_pending_upload(video_path: Path, thumbnail_path: Path, title: str, des
             thumbnail_path=str(thumbnail_path),
             title=title,
             description=desc,
-            tags=json.dumps(tags) if tags else None
+            tags=orjson.dumps(tags).decode() if tags else None
         )
         session.add(pending)
         session.commit()
@@ -51,39 +99,129 @@ def _save_pending_upload(video_path: Path, thumbnail_path: Path, title: str, des
     finally:
         session.close()
 
+# Access tokens by (client_id, refresh_token): (token, expires_at). Google's
+# tokens live ~1h, so back-to-back uploads skip the refresh round trip.
+_TOKEN_CACHE: Dict[Tuple[str, str], Tuple[str, float]] = {}
+_TOKEN_CACHE_LOCK = threading.Lock()
+# Refresh this long before expiry so a token never lapses mid-upload
+TOKEN_EXPIRY_MARGIN = 60
+
 def _get_access_token(client_id: str, client_secret: str, refresh_token: str) -> str:
-    """Exchanges refresh token for access token."""
+    """Exchanges refresh token for access token, reusing a cached one until near expiry."""
+    key = (client_id, refresh_token)
+    with _TOKEN_CACHE_LOCK:
+        cached = _TOKEN_CACHE.get(key)
+        if cached and time.time() < cached[1] - TOKEN_EXPIRY_MARGIN:
+            return cached[0]
+
     payload = {
         "client_id": client_id,
         "client_secret": client_secret,
         "refresh_token": refresh_token,
         "grant_type": "refresh_token"
     }
-    resp = requests.post(TOKEN_URI, data=payload)
+    resp = _get_session().post(TOKEN_URI, data=payload, timeout=HTTP_TIMEOUT)
     if resp.status_code != 200:
         raise UploadError(f"Failed to refresh token: {resp.text}")
-    return resp.json()["access_token"]
+    body = resp.json()
+    access_token = body["access_token"]
+    expires_in = body.get("expires_in")
+    if expires_in:
+        with _TOKEN_CACHE_LOCK:
+            _TOKEN_CACHE[key] = (access_token, time.time() + float(expires_in))
+    return access_token
+
+def _put_range(upload_url: str, body: bytes, content_range: str) -> requests.Response:
+    headers = {"Content-Type": "video/mp4", "Content-Length": str(len(body)), "Content-Range": content_range}
+    return _get_session().put(upload_url, headers=headers, data=body, timeout=HTTP_TIMEOUT)
+
+def _committed_offset(resp: requests.Response) -> int:
+    """First byte the server still needs, from a 308's "Range: bytes=0-N" (absent = nothing kept)."""
+    committed = resp.headers.get("Range")
+    return int(committed.rsplit("-", 1)[1]) + 1 if committed else 0
 
+def _upload_chunks(upload_url: str, data: memoryview, file_size: int) -> str:
+    """
+    Sends the file to a resumable session in UPLOAD_CHUNK_SIZE pieces.
+    YouTube only accepts chunks in order, so they go one at a time; what a
+    chunked session buys is that a 5xx or dropped connection costs one chunk,
+    not the whole file. After a failure the session is asked how much it kept
+    ("bytes */total") and the upload resumes from there. Chunks are slices of
+    `data`, so a resend re-slices instead of re-reading. Returns the video ID.
+    """
+    offset = 0
+    failures = 0
+    while True:
+        try:
+            if failures:
+                resp = _put_range(upload_url, b"", f"bytes */{file_size}")
+            else:
+                # Released right away so the mapping behind `data` can be closed
+                with data[offset:offset + UPLOAD_CHUNK_SIZE] as chunk:
+                    resp = _put_range(upload_url, chunk, f"bytes {offset}-{offset + len(chunk) - 1}/{file_size}")
+        except (requests.ConnectionError, requests.Timeout) as e:
+            resp, error = None, str(e)
+        else:
+            error = f"status {resp.status_code}"
+
+        if resp is not None:
+            if resp.status_code in (200, 201):
+                return resp.json().get("id")
+            if resp.status_code == 308:
+                offset, failures = _committed_offset(resp), 0
+                continue
+            if resp.status_code < 500 and resp.status_code != 429:
+                raise UploadError(f"Failed to upload video bytes: {resp.text}")
+
+        failures += 1
+        if failures >= UPLOAD_CHUNK_ATTEMPTS:
+            raise RetriableError(f"Server error uploading bytes: {error}")
+        delay = backoff_delay(failures - 1)
+        logger.warning(f"Chunk at byte {offset} failed ({error}); resuming in {delay:.1f}s")
+        time.sleep(delay)
+
+# Jittered so workers throttled at the same moment don't retry in lockstep
 @retry(
     stop=stop_after_attempt(5),
-    wait=wait_exponential(multiplier=1, min=2, max=60),
-    retry=retry_if_exception_type(RetriableError),
+    wait=wait_exponential_jitter(initial=1, max=30, jitter=0.5),
+    retry=_RETRYABLE,
     before_sleep=before_sleep_log(logger, logging.WARNING)
 )
-def _upload_file_resumable(video_path: Path, metadata: Dict, access_token: str) -> str:
-    """Uploads video using resumable protocol. Returns video ID."""
-    file_size = video_path.stat().st_size
+def _upload_file_resumable(video_path: Path, metadata_body: bytes, access_token: str) -> str:
+    """Uploads video using resumable protocol. `metadata_body` is the encoded videos.insert JSON. Returns video ID."""
+    # Opened once up front: size comes from the open descriptor, not a
+    # separate stat of the path (an extra round trip on network storage)
+    with open(video_path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if not file_size:
+            raise UploadError(f"Video file is empty: {video_path}")
+        upload_url = _start_resumable_session(file_size, metadata_body, access_token)
+
+        # 2. Upload Bytes, straight out of the page cache: chunk PUTs and
+        # resends after a failed chunk are views into one read-only mapping
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, "madvise"):
+                # Read strictly front to back; lets the kernel read ahead aggressively
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            with memoryview(mm) as data:
+                return _upload_chunks(upload_url, data, file_size)
+
+def _start_resumable_session(file_size: int, metadata_body: bytes, access_token: str) -> str:
+    """Creates the resumable upload session; returns its upload URL."""
     headers = {
         "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json",
+        "Content-Length": str(len(metadata_body)),
         "X-Upload-Content-Length": str(file_size),
         "X-Upload-Content-Type": "video/mp4" # Assumption
     }
     
     # 1. Start Session
     params = {"uploadType": "resumable", "part": "snippet,status"}
-    init_resp = requests.post(UPLOAD_URL, headers=headers, params=params, json=metadata)
+    init_resp = _get_session().post(UPLOAD_URL, headers=headers, params=params, data=metadata_body, timeout=HTTP_TIMEOUT)
     
+    if init_resp.status_code == 429:
+        raise RateLimitError(f"Rate limited initiating upload: {init_resp.text}")
     if init_resp.status_code >= 500:
         raise RetriableError(f"Server error initiating upload: {init_resp.status_code}")
     if init_resp.status_code != 200:
@@ -92,40 +230,30 @@ def _upload_file_resumable(video_path: Path, metadata: Dict, access_token: str)
     upload_url = init_resp.headers.get("Location")
     if not upload_url:
         raise UploadError("No upload URL returned in Location header")
-
-    # 2. Upload Bytes
-    # For simplicity, uploading in one go. For very large files, chunking is better.
-    with open(video_path, "rb") as f:
-        put_headers = {"Content-Type": "video/mp4"}
-        put_resp = requests.put(upload_url, headers=put_headers, data=f)
-    
-    if put_resp.status_code >= 500:
-         raise RetriableError(f"Server error uploading bytes: {put_resp.status_code}")
-    if put_resp.status_code not in (200, 201):
-        raise UploadError(f"Failed to upload video bytes: {put_resp.text}")
-        
-    return put_resp.json().get("id")
+    return upload_url
 
 @retry(
     stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=2, max=10),
-    retry=retry_if_exception_type(RetriableError)
+    wait=wait_exponential_jitter(initial=1, max=30, jitter=0.5),
+    retry=_RETRYABLE
 )
-def _set_thumbnail(video_id: str, thumbnail_path: Path, access_token: str):
-    """Sets the thumbnail for a video."""
+def _set_thumbnail(video_id: str, image: bytes, access_token: str):
+    """Sets the thumbnail for a video. `image` is the PNG body, read once by the caller so every retry sends identical bytes."""
     headers = {
         "Authorization": f"Bearer {access_token}"
     }
     params = {"videoId": video_id}
     
-    with open(thumbnail_path, "rb") as f:
-        # requests will handle multipart/form-data or raw bytes if files passed?
-        # API expects binary content in body with correct content-type
-        # Actually `videos.insert` supports media upload, `thumbnails.set` also does.
-        # "The request body contains the image binary data."
-        headers["Content-Type"] = "image/png" # Assuming png from previous task
-        resp = requests.post(THUMBNAIL_URL, headers=headers, params=params, data=f)
+    # requests will handle multipart/form-data or raw bytes if files passed?
+    # API expects binary content in body with correct content-type
+    # Actually `videos.insert` supports media upload, `thumbnails.set` also does.
+    # "The request body contains the image binary data."
+    headers["Content-Type"] = "image/png" # Assuming png from previous task
+    headers["Content-Length"] = str(len(image))
+    resp = _get_session().post(THUMBNAIL_URL, headers=headers, params=params, data=image, timeout=HTTP_TIMEOUT)
         
+    if resp.status_code == 429:
+        raise RateLimitError(f"Rate limited setting thumbnail: {resp.text}")
     if resp.status_code >= 500:
         raise RetriableError(f"Server error setting thumbnail: {resp.status_code}")
     if resp.status_code != 200:
@@ -135,6 +263,15 @@ def _set_thumbnail(video_id: str, thumbnail_path: Path, access_token: str):
         # Let's assume strict success.
         raise UploadError(f"Failed to set thumbnail: {resp.text}")
 
+DEFAULT_CATEGORY_ID = "22" # People & Blogs default
+
+def _build_metadata(title: str, desc: str, tags: List[str], privacy_status: str) -> Dict[str, Any]:
+    """videos.insert body. Built as one literal: cheaper than deep-copying a template."""
+    return {
+        "snippet": {"title": title, "description": desc, "tags": tags, "categoryId": DEFAULT_CATEGORY_ID},
+        "status": {"privacyStatus": privacy_status, "selfDeclaredMadeForKids": False},
+    }
+
 def upload_video(
     video_path: Path, 
     thumbnail_path: Path, 
@@ -189,28 +326,18 @@ def upload_video(
         access_token = _get_access_token(client_id, client_secret, refresh_token)
         
         # Prepare Metadata
-        metadata = {
-            "snippet": {
-                "title": title,
-                "description": desc,
-                "tags": tags,
-                "categoryId": "22" # People & Blogs default
-            },
-            "status": {
-                "privacyStatus": privacy_status,
-                "selfDeclaredMadeForKids": False
-            }
-        }
+        # Encoded once; upload retries resend the same bytes
+        metadata_body = orjson.dumps(_build_metadata(title, desc, tags, privacy_status))
         
         # Upload Video
         logger.info(f"Starting upload for {title}...")
-        video_id = _upload_file_resumable(video_path, metadata, access_token)
+        video_id = _upload_file_resumable(video_path, metadata_body, access_token)
         logger.info(f"Video uploaded: {video_id}")
         
         # Upload Thumbnail
         if thumbnail_path.exists():
             logger.info("Uploading thumbnail...")
-            _set_thumbnail(video_id, thumbnail_path, access_token)
+            _set_thumbnail(video_id, thumbnail_path.read_bytes(), access_token)
             
         return {"status": "uploaded", "videoId": video_id}
         
@@ -0,0 +1,47 @@
+import re
+import subprocess
+from functools import lru_cache
+from pathlib import Path
+from typing import FrozenSet, List, Optional, Union
+
+# Resolve the binary the same way MoviePy always has for this project:
+# FFMPEG_BINARY from the environment, else the build bundled with imageio-ffmpeg.
+from moviepy.config import FFMPEG_BINARY
+
+_DURATION_RE = re.compile(rb"Duration: (\d+):(\d\d):(\d\d(?:\.\d+)?)")
+# Lines of `ffmpeg -encoders` look like " V....D h264_nvenc  NVIDIA NVENC H.264 encoder"
+_ENCODER_RE = re.compile(r"^ [VAS][A-Z.]{5} (\w+)", re.MULTILINE)
+
+def run_ffmpeg(args: List[str], input: Optional[bytes] = None) -> None:
+    """
+    Runs ffmpeg with the given arguments (binary and -y/-loglevel are prepended).
+    `input` is fed to ffmpeg's stdin, for use with "-i pipe:0".
+    Raises RuntimeError with ffmpeg's stderr if it exits non-zero.
+    """
+    cmd = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-y", *args]
+    stdin = subprocess.DEVNULL if input is None else None
+    proc = subprocess.run(cmd, input=input, stdin=stdin, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed ({proc.returncode}): {proc.stderr.decode(errors='replace').strip()}")
+
+def probe_duration(path: Union[str, Path]) -> float:
+    """Returns the duration in seconds of a media file, as reported by ffmpeg."""
+    # With no output file ffmpeg prints the input header and exits non-zero
+    proc = subprocess.run(
+        [FFMPEG_BINARY, "-hide_banner", "-i", str(path)],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    match = _DURATION_RE.search(proc.stderr)
+    if not match:
+        raise RuntimeError(f"Could not read duration of {path}: {proc.stderr.decode(errors='replace').strip()}")
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+@lru_cache(maxsize=1)
+def available_encoders() -> FrozenSet[str]:
+    """Names of the encoders compiled into this ffmpeg build (probed once per process)."""
+    proc = subprocess.run(
+        [FFMPEG_BINARY, "-hide_banner", "-encoders"],
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    return frozenset(_ENCODER_RE.findall(proc.stdout.decode(errors="replace")))
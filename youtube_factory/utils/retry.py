@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional, Tuple, Type, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Indirection so tests can skip real backoff sleeps
+_sleep = time.sleep
+
+class RateLimiter:
+    """
+    Client-side throttle for a requests/min and (optionally) tokens/min budget.
+
+    Each acquire() reserves its share up front and sleeps until the budget
+    covers it, so callers wait *before* sending instead of burning a request
+    on a 429. Buckets may go negative; the deficit is the wait. Thread-safe,
+    and acquire_async() shares the same budget.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: Optional[float] = None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute or 0)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        """Takes one request (and `tokens`) from the buckets; returns seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            elapsed, self._last = now - self._last, now
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+            self._requests -= 1
+            wait = max(0.0, -self._requests * 60 / self.requests_per_minute)
+            if self.tokens_per_minute:
+                self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+                self._tokens -= tokens
+                wait = max(wait, -self._tokens * 60 / self.tokens_per_minute)
+            return wait
+
+    def acquire(self, tokens: int = 0):
+        wait = self._reserve(tokens)
+        if wait > 0:
+            _sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 10.0, jitter: float = 1.0) -> float:
+    """Exponential backoff with additive jitter: min(base * 2**attempt + U(0, jitter), cap)."""
+    return min(base * 2 ** attempt + random.uniform(0, jitter), cap)
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """
+    Server-requested delay carried by an HTTP error, if any. Looks for
+    `headers` on the exception or on its `response` (requests, httpx/openai,
+    aiohttp) and reads retry-after-ms or retry-after (seconds form only).
+    """
+    headers = getattr(exc, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        lowered = {str(k).lower(): v for k, v in headers.items()}
+    except AttributeError:
+        return None
+    try:
+        if "retry-after-ms" in lowered:
+            return float(lowered["retry-after-ms"]) / 1000
+        if "retry-after" in lowered:
+            return float(lowered["retry-after"])
+    except (TypeError, ValueError):
+        # HTTP-date form; fall back to our own backoff
+        pass
+    return None
+
+def _next_delay(exc: BaseException, attempt: int, base: float, cap: float) -> float:
+    # Honour the server's Retry-After exactly; it knows when the window resets
+    server_delay = retry_after_seconds(exc)
+    return server_delay if server_delay is not None else backoff_delay(attempt, base, cap)
+
+def call_with_retry(
+    fn: Callable[[], T],
+    attempts: int = 3,
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+    base: float = 1.0,
+    cap: float = 10.0,
+    limiter: Optional[RateLimiter] = None,
+    tokens: int = 0,
+) -> T:
+    """
+    Calls fn() up to `attempts` times, sleeping between failures in
+    `retry_on`. The last failure is re-raised. With a limiter, every attempt
+    first waits for rate budget.
+    """
+    for attempt in range(attempts):
+        if limiter is not None:
+            limiter.acquire(tokens)
+        try:
+            return fn()
+        except retry_on as e:
+            if attempt == attempts - 1:
+                raise
+            delay = _next_delay(e, attempt, base, cap)
+            logger.warning(f"Attempt {attempt + 1}/{attempts} failed ({e}); retrying in {delay:.1f}s")
+            _sleep(delay)
+
+async def call_with_retry_async(
+    fn: Callable[[], Awaitable[T]],
+    attempts: int = 3,
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+    base: float = 1.0,
+    cap: float = 10.0,
+    limiter: Optional[RateLimiter] = None,
+    tokens: int = 0,
+) -> T:
+    """Async counterpart of call_with_retry; fn is a coroutine function."""
+    for attempt in range(attempts):
+        if limiter is not None:
+            await limiter.acquire_async(tokens)
+        try:
+            return await fn()
+        except retry_on as e:
+            if attempt == attempts - 1:
+                raise
+            delay = _next_delay(e, attempt, base, cap)
+            logger.warning(f"Attempt {attempt + 1}/{attempts} failed ({e}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
@@ -3,10 +3,13 @@ import sys
 import argparse
 import logging
 import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from datetime import datetime
+from typing import Dict, Iterable, Optional
+from datetime import datetime, timedelta
 
-from redis import Redis
+from redis import ConnectionPool, Redis
 from rq import Queue, Worker
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -22,13 +25,13 @@ import openai
 # I created: script_gen, tts, assets, composer, thumbnail, uploader.
 # I did NOT create topic_finder yet. I will check if it exists or just proceed with what I have and maybe add a placeholder.
 
-from youtube_factory.tasks.script_gen import generate_script
+from youtube_factory.tasks.script_gen import generate_script, script_cache_key
 from youtube_factory.tasks.tts import tts_from_text
 from youtube_factory.tasks.assets import build_assets
 from youtube_factory.tasks.composer import compose_video
 from youtube_factory.tasks.thumbnail import generate_thumbnail
 from youtube_factory.tasks.uploader import upload_video
-from youtube_factory.models import Job, Base
+from youtube_factory.models import Job, ScriptCache, JSON_ENGINE_KWARGS, init_db
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO)
@@ -36,38 +39,171 @@ logger = logging.getLogger(__name__)
 
 # DB Setup
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./youtube_factory.db")
-engine = create_engine(DATABASE_URL)
-Base.metadata.create_all(engine)
+engine = create_engine(DATABASE_URL, **JSON_ENGINE_KWARGS)
+init_db(engine)
 SessionLocal = sessionmaker(bind=engine)
 
 # Redis Setup
-REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379")
-redis_conn = Redis.from_url(REDIS_URL)
+# .env.example ships REDIS_URL empty; treat that as unset
+REDIS_URL = os.environ.get("REDIS_URL") or "redis://localhost:6379"
+# Explicit pool: capped, with TCP keepalive and a health check so
+# connections idle between jobs are verified instead of failing on first use
+redis_pool = ConnectionPool.from_url(REDIS_URL, max_connections=32, socket_keepalive=True, health_check_interval=30)
+redis_conn = Redis(connection_pool=redis_pool)
 queue = Queue("youtube_factory", connection=redis_conn)
 
-def _update_job_status(job_id: int, status: str, metadata: dict = None):
+# Status commits run here so the pipeline doesn't wait on them; one worker
+# keeps them in submission order
+_STATUS_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-status")
+
+class _JobHandle:
+    """The pipeline's one Job row, loaded once; status/metadata changes stay
+    in memory until flushed."""
+
+    def __init__(self, session, job: Optional[Job]):
+        self.session = session
+        self.job = job
+        self._pending = None
+
+    def set_status(self, status: str, metadata: dict = None):
+        if self.job is None:
+            return
+        # The session isn't thread-safe; never touch the row mid-commit
+        self.wait()
+        self.job.status = status
+        if metadata:
+            # Merge or replace metadata
+            current_meta = dict(self.job.metadata_json or {})
+            current_meta.update(metadata)
+            self.job.metadata_json = current_meta
+
+    def flush(self):
+        self.wait()
+        self._commit()
+
+    def flush_in_background(self):
+        """Commits on _STATUS_EXECUTOR; the next set_status/flush waits for it."""
+        self.wait()
+        self._pending = _STATUS_EXECUTOR.submit(self._commit)
+
+    def wait(self):
+        if self._pending is not None:
+            self._pending.result()
+            self._pending = None
+
+    def _commit(self):
+        try:
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"Failed to update job status: {e}")
+
+@contextmanager
+def _job_session(job_id: int):
+    """
+    One session per pipeline run instead of one per status change. Pending
+    changes are committed on exit, including when the body raises. Objects
+    are not expired on commit, so no read transaction is held open between
+    writes while the job runs.
+    """
+    session = SessionLocal(expire_on_commit=False)
+    job = None
+    try:
+        job = session.get(Job, job_id)
+    except Exception as e:
+        logger.error(f"Failed to load job {job_id}: {e}")
+    handle = _JobHandle(session, job)
+    try:
+        yield handle
+    finally:
+        handle.flush()
+        session.close()
+
+# Scripts for a repeated (topic, language, length) are reused for this long
+SCRIPT_CACHE_TTL = timedelta(seconds=int(os.environ.get("SCRIPT_CACHE_TTL_SECONDS", 7 * 24 * 3600)))
+
+def _load_cached_script(cache_key: str) -> Optional[dict]:
+    session = SessionLocal()
+    try:
+        entry = session.get(ScriptCache, cache_key)
+        if entry and entry.created_at >= datetime.utcnow() - SCRIPT_CACHE_TTL:
+            return entry.script_json
+    except Exception as e:
+        logger.warning(f"Script cache lookup failed: {e}")
+    finally:
+        session.close()
+    return None
+
+def _store_cached_script(cache_key: str, topic: str, language: str, length: int, script_obj: dict):
     session = SessionLocal()
     try:
-        job = session.query(Job).filter(Job.id == job_id).first()
-        if job:
-            job.status = status
-            if metadata:
-                # Merge or replace metadata
-                current_meta = dict(job.metadata_json or {})
-                current_meta.update(metadata)
-                job.metadata_json = current_meta
-            session.commit()
+        # merge: replaces an expired entry, and a concurrent job writing the
+        # same key just overwrites it with an equally valid script
+        session.merge(ScriptCache(
+            cache_key=cache_key, topic=topic, language=language,
+            length_seconds=length, script_json=script_obj, created_at=datetime.utcnow()
+        ))
+        session.commit()
     except Exception as e:
-        logger.error(f"Failed to update job status: {e}")
+        session.rollback()
+        logger.warning(f"Script cache write failed: {e}")
     finally:
         session.close()
 
+# Per-stage progress lives in Redis (hash "job:<id>"); the jobs table only
+# gets the start and terminal states, so each run costs two commits instead of seven.
+# The API reads it back through read_progress.
+PROGRESS_TTL_SECONDS = 24 * 3600
+
+def _progress_key(job_id: int) -> str:
+    return f"job:{job_id}"
+
+def _publish_progress(job_id: int, stage: str):
+    try:
+        key = _progress_key(job_id)
+        pipe = redis_conn.pipeline(transaction=False)
+        pipe.hset(key, mapping={"stage": stage, "updated_at": datetime.utcnow().isoformat()})
+        pipe.expire(key, PROGRESS_TTL_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        # Progress is informational; never fail a job over it
+        logger.warning(f"Failed to publish progress for job {job_id}: {e}")
+
+def read_progress(job_ids: Iterable[int]) -> Dict[int, Dict[str, str]]:
+    """
+    Latest published progress ({"stage", "updated_at"}) per job, fetched in one
+    Redis round trip. Jobs with no (or expired) progress are left out; if Redis
+    is unreachable the result is empty rather than an error.
+    """
+    job_ids = list(job_ids)
+    if not job_ids:
+        return {}
+    try:
+        pipe = redis_conn.pipeline(transaction=False)
+        for job_id in job_ids:
+            pipe.hgetall(_progress_key(job_id))
+        hashes = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to read job progress: {e}")
+        return {}
+    return {
+        job_id: {k.decode(): v.decode() for k, v in fields.items()}
+        for job_id, fields in zip(job_ids, hashes)
+        if fields
+    }
+
 def run_pipeline(job_id: int, topic: str, niche: str, language: str, voice_profile: str, length: int):
     """
     Executes the full video generation pipeline.
     """
     logger.info(f"Starting pipeline for Job {job_id} - Topic: {topic}")
-    _update_job_status(job_id, "processing")
+    with _job_session(job_id) as job_handle:
+        _run_stages(job_handle, job_id, topic, language, voice_profile, length)
+
+def _run_stages(job_handle: _JobHandle, job_id: int, topic: str, language: str, voice_profile: str, length: int):
+    """Script through upload for run_pipeline; records the terminal status on job_handle."""
+    # Stage outputs accumulate here and are written with the terminal status
+    metadata = {}
     
     storage_path = Path(os.environ.get("STORAGE_PATH", "/tmp/youtube_factory"))
     storage_path.mkdir(parents=True, exist_ok=True)
@@ -87,38 +223,67 @@ def run_pipeline(job_id: int, topic: str, niche: str, language: str, voice_profi
         else:
              llm_client = openai.OpenAI(api_key=api_key)
 
-        logger.info("Generating script...")
-        script_obj = generate_script(topic=topic, language=language, length_target_seconds=length, llm_client=llm_client)
-        _update_job_status(job_id, "script_generated", {"script": script_obj})
-        
-        # 2. TTS
-        logger.info("Generating voiceover...")
-        # Combine hook + body sections for full text? Or pass sections?
-        # composer expects a single audio file.
-        # Let's concatenate text.
-        full_text = script_obj.get("hook", "") + " "
-        for sec in script_obj.get("sections", []):
-            full_text += sec.get("heading", "") + ". " + sec.get("body", "") + " "
-        full_text += script_obj.get("cta", "")
-        
-        voice_path = tts_from_text(full_text, voice_profile=voice_profile, llm_client=None, storage_path=storage_path) # llm_client used for http in tts, optional
-        _update_job_status(job_id, "tts_complete", {"voice_path": str(voice_path)})
-        
-        # 3. Assets
-        logger.info("Building assets...")
-        pexels_key = os.environ.get("PEXELS_API_KEY")
-        assets_paths = build_assets(script_obj, storage_path, pexels_api_key=pexels_key)
-        _update_job_status(job_id, "assets_ready", {"assets": [str(p) for p in assets_paths]})
-        
-        # 4. Composer
-        logger.info("Composing video...")
-        final_video_path = compose_video(script_obj, voice_path, assets_paths, storage_path)
-        _update_job_status(job_id, "video_composed", {"video_path": str(final_video_path)})
+        cache_key = script_cache_key(topic, language, length)
+        script_obj = _load_cached_script(cache_key)
+
+        # Nothing reads the row back, so the "processing" commit runs in the
+        # background, overlapping the LLM call; the next DB write waits for it
+        job_handle.set_status("processing")
+        job_handle.flush_in_background()
+        _publish_progress(job_id, "processing")
+
+        if script_obj is not None:
+            logger.info("Reusing cached script")
+        else:
+            logger.info("Generating script...")
+            script_obj = generate_script(topic=topic, language=language, length_target_seconds=length, llm_client=llm_client)
+            job_handle.wait()
+            _store_cached_script(cache_key, topic, language, length, script_obj)
+        metadata["script"] = script_obj
+        _publish_progress(job_id, "script_generated")
         
-        # 5. Thumbnail
-        logger.info("Generating thumbnail...")
-        thumbnail_path = generate_thumbnail(script_obj, storage_path, ai_image_api_key=api_key)
-        _update_job_status(job_id, "thumbnail_ready", {"thumbnail_path": str(thumbnail_path)})
+        # TTS, assets and thumbnail each need only the script, so they run
+        # together and compose starts once the first two are in; the thumbnail
+        # can keep going through compose. Threads suffice: these are network
+        # waits or ffmpeg/Pillow work that releases the GIL.
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix=f"job{job_id}") as pool:
+            logger.info("Generating thumbnail...")
+            thumbnail_future = pool.submit(generate_thumbnail, script_obj, storage_path, ai_image_api_key=api_key)
+            logger.info("Building assets...")
+            pexels_key = os.environ.get("PEXELS_API_KEY")
+            assets_future = pool.submit(build_assets, script_obj, storage_path, pexels_api_key=pexels_key)
+
+            # 2. TTS
+            logger.info("Generating voiceover...")
+            # Combine hook + body sections for full text? Or pass sections?
+            # composer expects a single audio file.
+            # Let's concatenate text.
+            # Joined once rather than grown with += (quadratic for long scripts)
+            full_text = "".join([
+                script_obj.get("hook", ""), " ",
+                *(f"{sec.get('heading', '')}. {sec.get('body', '')} " for sec in script_obj.get("sections", [])),
+                script_obj.get("cta", ""),
+            ])
+            
+            voice_path = tts_from_text(full_text, voice_profile=voice_profile, llm_client=None, storage_path=storage_path) # llm_client used for http in tts, optional
+            metadata["voice_path"] = str(voice_path)
+            _publish_progress(job_id, "tts_complete")
+            
+            # 3. Assets (started above)
+            assets_paths = assets_future.result()
+            metadata["assets"] = [str(p) for p in assets_paths]
+            _publish_progress(job_id, "assets_ready")
+            
+            # 4. Composer
+            logger.info("Composing video...")
+            final_video_path = compose_video(script_obj, voice_path, assets_paths, storage_path)
+            metadata["video_path"] = str(final_video_path)
+            _publish_progress(job_id, "video_composed")
+            
+            # 5. Thumbnail (started above)
+            thumbnail_path = thumbnail_future.result()
+            metadata["thumbnail_path"] = str(thumbnail_path)
+            _publish_progress(job_id, "thumbnail_ready")
         
         # 6. Uploader
         logger.info("Uploading...")
@@ -132,12 +297,19 @@ def run_pipeline(job_id: int, topic: str, niche: str, language: str, voice_profi
         )
         
         final_status = "completed" if upload_result.get("status") == "uploaded" else "pending_upload"
-        _update_job_status(job_id, final_status, {"upload_result": upload_result})
+        metadata["upload_result"] = upload_result
+        job_handle.set_status(final_status, metadata)
+        job_handle.flush()
+        _publish_progress(job_id, final_status)
         logger.info(f"Job {job_id} finished with status: {final_status}")
         
     except Exception as e:
         logger.exception(f"Job {job_id} failed")
-        _update_job_status(job_id, "failed", {"error": str(e)})
+        # Keep whatever the earlier stages produced alongside the error
+        metadata["error"] = str(e)
+        job_handle.set_status("failed", metadata)
+        job_handle.flush()
+        _publish_progress(job_id, "failed")
         raise e # Let RQ handle retry if configured, though we handled it by marking failed DB status.
 
 def enqueue_job(topic, niche, language, voice_profile, length):